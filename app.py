@@ -1,16 +1,29 @@
 import asyncio
 import logging
 import re
+import signal
+import time
 
+from slack_bolt import BoltResponse
 from slack_bolt.async_app import AsyncApp
 from slack_bolt.adapter.socket_mode.async_handler import AsyncSocketModeHandler
 
 from config import settings
-from services.layerv import layerv_client, InvalidApiKeyError
+from services.layerv import layerv_client, InvalidApiKeyError, QURLRequest, QURLResponse
 from services.ai_analyzer import ai_analyzer
-from services.url_parser import extract_urls, normalize_url, is_valid_url
-from services.i18n import get_message
+from services.intent_parser import intent_parser
+from services.domain_resolver import domain_resolver
+from services.url_parser import split_slack_text, normalize_and_validate
+from services.i18n import detect_language, get_message
 from services.user_store import user_store
+from services.rate_limiter import admission_controller
+from services.qurl_pool import qurl_pool
+from services.event_dedupe import event_deduper, event_keys
+from services.job_queue import job_queue, Priority
+from services.slack_reply import ProgressiveReply
+from services.metrics import errors_total, stage_seconds, start_metrics_server
+from services.tracing import tracer
+from services.profiler import profiler
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -19,25 +32,77 @@ logger = logging.getLogger(__name__)
 # Initialize Slack app with Socket Mode
 app = AsyncApp(token=settings.slack_bot_token)
 
+MENTION_PATTERN = re.compile(r"<@[A-Z0-9]+>")
+
 
 def preprocess_slack_text(text: str) -> str:
     """
     Preprocess Slack message text.
     Convert Slack link format <http://url|display> to plain URL.
     """
-    # Convert Slack links to plain URLs
-    text = re.sub(r'<(https?://[^|>]+)\|[^>]+>', r'\1', text)
-    text = re.sub(r'<(https?://[^>]+)>', r'\1', text)
-    return text
+    return split_slack_text(text)[0]
+
+
+@app.middleware
+async def drop_duplicate_events(body, next):
+    """Acknowledge Slack retries and redeliveries without running any handler."""
+    if body.get("type") == "event_callback" and await event_deduper.is_duplicate(event_keys(body)):
+        return BoltResponse(status=200, body="")
+    await next()
+
+
+async def enqueue(
+    priority: Priority,
+    job,
+    say,
+    user: str | None = None,
+    lang: str = "en",
+    name: str = "slack.job",
+    correlation_id: str | None = None,
+    delay: float = 0.0,
+):
+    """
+    Queue work for the worker pool so the Slack handler returns right away.
+
+    The job runs inside a trace named `name`, tagged with the Slack event or
+    trigger ID. If the job is shed (now, or later to make room for a more
+    important one) the user gets a "busy" reply instead. A `delay` (from rate
+    limiting) is waited out before queueing, so it never holds a worker.
+    """
+    mention = f"<@{user}> " if user else ""
+    received_ns = time.time_ns()
+
+    async def traced_job():
+        with tracer.trace(name, correlation_id=correlation_id, start_ns=received_ns, user_id=user or ""):
+            await job()
 
+    async def reply_busy():
+        await say(f"{mention}{get_message('busy', lang)}")
+
+    if delay > 0:
+        await asyncio.sleep(delay)
+    if not job_queue.submit(priority, traced_job, on_shed=reply_busy):
+        await reply_busy()
+
+
+async def enqueue_message(priority: Priority, text: str, user: str, say, name: str, correlation_id: str | None):
+    """Admit a Slack message against the rate limits and queue it for processing."""
+    lang = detect_language(text)
+    delay = admission_controller.reserve_message(user)
+    if delay is None:
+        await say(f"<@{user}> {get_message('rate_limited', lang)}")
+        return
 
-def detect_language_from_text(text: str) -> str:
-    """Simple language detection based on character analysis."""
-    # Check for Chinese characters
-    chinese_pattern = re.compile(r'[\u4e00-\u9fff]')
-    if chinese_pattern.search(text):
-        return "zh"
-    return "en"
+    await enqueue(
+        priority,
+        lambda: process_message(text, user, say),
+        say,
+        user=user,
+        lang=lang,
+        name=name,
+        correlation_id=correlation_id,
+        delay=delay,
+    )
 
 
 # ============== Slash Commands ==============
@@ -46,7 +111,17 @@ def detect_language_from_text(text: str) -> str:
 async def handle_setkey(ack, command, say):
     """Handle /setkey command to configure API key."""
     await ack()
+    await enqueue(
+        Priority.COMMAND,
+        lambda: setkey(command, say),
+        say,
+        name="/setkey",
+        correlation_id=command.get("trigger_id"),
+    )
 
+
+async def setkey(command: dict, say):
+    """Save a user's API key."""
     user_id = command["user_id"]
     api_key = command["text"].strip()
 
@@ -62,7 +137,8 @@ async def handle_setkey(ack, command, say):
 
     try:
         # Save API key directly without verification
-        user_store.set_api_key(user_id, api_key)
+        await user_store.set_api_key(user_id, api_key)
+        qurl_pool.invalidate(user_id)
         await say(get_message("setkey_success", lang))
     except Exception as e:
         logger.error(f"Error setting API key for {user_id}: {e}")
@@ -73,11 +149,21 @@ async def handle_setkey(ack, command, say):
 async def handle_mykey(ack, command, say):
     """Handle /mykey command to show API key status."""
     await ack()
+    await enqueue(
+        Priority.COMMAND,
+        lambda: mykey(command, say),
+        say,
+        name="/mykey",
+        correlation_id=command.get("trigger_id"),
+    )
+
 
+async def mykey(command: dict, say):
+    """Show a user's API key status."""
     user_id = command["user_id"]
     lang = "en"
 
-    key_info = user_store.get_key_info(user_id)
+    key_info = await user_store.get_key_info(user_id)
 
     if key_info:
         await say(get_message(
@@ -94,32 +180,147 @@ async def handle_mykey(ack, command, say):
 async def handle_delkey(ack, command, say):
     """Handle /delkey command to delete API key."""
     await ack()
+    await enqueue(
+        Priority.COMMAND,
+        lambda: delkey(command, say),
+        say,
+        name="/delkey",
+        correlation_id=command.get("trigger_id"),
+    )
 
+
+async def delkey(command: dict, say):
+    """Delete a user's API key."""
     user_id = command["user_id"]
     lang = "en"
 
-    if user_store.delete_api_key(user_id):
+    qurl_pool.invalidate(user_id)
+    if await user_store.delete_api_key(user_id):
         await say(get_message("delkey_success", lang))
     else:
         await say(get_message("delkey_none", lang))
 
 
+def is_admin(user_id: str) -> bool:
+    """Check if a Slack user may run admin commands."""
+    admins = {u.strip() for u in settings.admin_user_ids.split(",") if u.strip()}
+    return user_id in admins
+
+
+@app.command("/reloadaliases")
+async def handle_reloadaliases(ack, command, say):
+    """Handle /reloadaliases admin command to reload domain_aliases.json."""
+    await ack()
+
+    lang = "en"
+
+    if not is_admin(command["user_id"]):
+        await say(get_message("admin_only", lang))
+        return
+
+    await enqueue(
+        Priority.COMMAND,
+        lambda: reloadaliases(say),
+        say,
+        name="/reloadaliases",
+        correlation_id=command.get("trigger_id"),
+    )
+
+
+async def reloadaliases(say):
+    """Reload domain_aliases.json and report the result."""
+    lang = "en"
+
+    try:
+        if await domain_resolver.reload(force=True):
+            await say(get_message(
+                "reload_aliases_success",
+                lang,
+                count=len(domain_resolver.aliases),
+                version=domain_resolver.version,
+            ))
+        else:
+            await say(get_message("reload_aliases_unchanged", lang, version=domain_resolver.version))
+    except Exception as e:
+        logger.error(f"Failed to reload domain aliases: {e}")
+        await say(get_message("reload_aliases_error", lang, error=str(e)))
+
+
+# Profiles run outside the worker pool; keep a reference so they aren't garbage collected
+profile_tasks: set[asyncio.Task] = set()
+
+
+@app.command("/profile")
+async def handle_profile(ack, command, say):
+    """Handle /profile admin command to sample the event loop for N seconds."""
+    await ack()
+
+    lang = "en"
+
+    if not is_admin(command["user_id"]):
+        await say(get_message("admin_only", lang))
+        return
+
+    max_seconds = settings.profile_max_seconds
+    try:
+        seconds = float(command["text"].strip() or 10)
+    except ValueError:
+        seconds = 0
+    if not 0 < seconds <= max_seconds:
+        await say(get_message("profile_usage", lang, max_seconds=f"{max_seconds:g}"))
+        return
+    if profiler.running:
+        await say(get_message("profile_busy", lang))
+        return
+
+    await say(get_message("profile_started", lang, seconds=f"{seconds:g}"))
+    task = asyncio.create_task(run_profile(seconds, say))
+    profile_tasks.add(task)
+    task.add_done_callback(profile_tasks.discard)
+
+
+async def run_profile(seconds: float, say):
+    """Run the sampling profiler and report the result."""
+    lang = "en"
+
+    try:
+        result = await profiler.profile(seconds)
+    except RuntimeError:
+        await say(get_message("profile_busy", lang))
+        return
+
+    top_frames = "\n".join(f"• `{frame}` ({count})" for frame, count in result.top_frames) or "-"
+    await say(get_message(
+        "profile_done",
+        lang,
+        samples=result.samples,
+        busy=result.busy_samples,
+        stalled=result.stalled_samples,
+        max_lag=f"{result.max_loop_lag * 1000:.1f}",
+        p99_lag=f"{result.p99_loop_lag * 1000:.1f}",
+        path=result.path,
+        top_frames=top_frames,
+    ))
+
+
 # ============== Message Events ==============
 
 @app.event("app_mention")
-async def handle_app_mention(event, say):
+async def handle_app_mention(event, say, body):
     """Handle when bot is mentioned in a channel."""
     text = event.get("text", "")
     user = event.get("user")
 
     # Remove bot mention from text
-    text = re.sub(r"<@[A-Z0-9]+>", "", text).strip()
+    text = MENTION_PATTERN.sub("", text).strip()
 
-    await process_message(text, user, say)
+    await enqueue_message(
+        Priority.MENTION, text, user, say, name="app_mention", correlation_id=body.get("event_id")
+    )
 
 
 @app.event("message")
-async def handle_direct_message(event, say):
+async def handle_direct_message(event, say, body):
     """Handle direct messages to the bot."""
     # Only process direct messages (no subtype means it's a regular message)
     if event.get("channel_type") != "im":
@@ -131,35 +332,54 @@ async def handle_direct_message(event, say):
     user = event.get("user")
 
     # Skip if message contains bot mention (will be handled by app_mention event)
-    if re.search(r"<@[A-Z0-9]+>", text):
+    if MENTION_PATTERN.search(text):
         return
 
-    await process_message(text, user, say)
+    await enqueue_message(
+        Priority.DIRECT_MESSAGE, text, user, say, name="message.im", correlation_id=body.get("event_id")
+    )
 
 
 async def process_message(text: str, user: str, say):
     """Process user message using Claude AI for semantic analysis."""
     # Default language
     lang = "en"
+    # Placeholder message edited in place for multi-URL requests
+    progress: ProgressiveReply | None = None
+
+    async def reply(text: str):
+        """Send the final reply, into the placeholder if one was posted."""
+        with stage_seconds.labels(stage="reply").time():
+            if progress is not None:
+                await progress.finish(text, say=say)
+            else:
+                await say(text)
 
     if not text:
-        await say(f"<@{user}> {get_message('empty_input', lang)}")
+        await reply(f"<@{user}> {get_message('empty_input', lang)}")
         return
 
-    # Preprocess Slack text format
-    clean_text = preprocess_slack_text(text)
+    # Preprocess Slack text format, extracting URLs in the same pass
+    # (regex fallback for anything the analysis misses)
+    with stage_seconds.labels(stage="preprocess").time():
+        clean_text, extracted_urls = split_slack_text(text)
     logger.info(f"Processing message from {user}: {clean_text}")
 
     # Check if user has API key configured
-    if not user_store.has_api_key(user):
+    with stage_seconds.labels(stage="key_lookup").time():
+        has_api_key = await user_store.has_api_key(user)
+    if not has_api_key:
         # Detect language from user's message
-        lang = detect_language_from_text(clean_text)
-        await say(f"<@{user}> {get_message('no_api_key', lang)}")
+        lang = detect_language(clean_text)
+        await reply(f"<@{user}> {get_message('no_api_key', lang)}")
         return
 
     try:
-        # Use Claude AI for semantic analysis
-        analysis = await ai_analyzer.analyze(clean_text)
+        # Handle unambiguous requests locally, use Claude AI for everything else
+        with stage_seconds.labels(stage="analyze").time():
+            analysis = intent_parser.parse(clean_text)
+            if analysis is None:
+                analysis = await ai_analyzer.analyze(clean_text)
         lang = analysis.language
 
         # Force wants_proxy=True if message contains "QURL" (case-insensitive)
@@ -172,85 +392,156 @@ async def process_message(text: str, user: str, say):
             f"wants_proxy={wants_proxy}, expires_in={analysis.expires_in}"
         )
 
-        # Also extract URLs from text as fallback (handles Slack formatting)
-        extracted_urls = extract_urls(text)
-
         # Merge URLs from AI analysis and regex extraction, normalize and dedupe
         combined_urls = analysis.urls + extracted_urls
-        normalized_urls = [normalize_url(url) for url in combined_urls]
-        all_urls = list(dict.fromkeys(normalized_urls))  # Dedupe while preserving order
+        # Normalize and validate in one step; invalid URLs are kept (as given) to be reported
+        normalized = {}
+        for url in combined_urls:
+            result = normalize_and_validate(url)
+            normalized.setdefault(result or url.strip(), result is not None)
+        all_urls = list(normalized)  # Deduped while preserving order
 
         if not all_urls:
-            await say(f"<@{user}> {get_message('no_url_detected', lang)}")
+            await reply(f"<@{user}> {get_message('no_url_detected', lang)}")
             return
 
         if not wants_proxy:
             # User provided URL but didn't explicitly ask for proxy
-            await say(
+            await reply(
                 f"<@{user}> {get_message('url_detected_no_proxy', lang, urls=', '.join(all_urls), example_url=all_urls[0])}"
             )
             return
 
         # Get user's API key
-        api_key = user_store.get_api_key(user)
+        with stage_seconds.labels(stage="key_lookup").time():
+            api_key = await user_store.get_api_key(user)
         if not api_key:
-            await say(f"<@{user}> {get_message('no_api_key', lang)}")
+            await reply(f"<@{user}> {get_message('no_api_key', lang)}")
             return
 
-        # Generate QURL for each URL
-        results = []
-        errors = []
-
-        for url in all_urls:
-            if not is_valid_url(url):
-                errors.append(get_message("invalid_url", lang, url=url))
-                continue
-
-            try:
-                qurl_response = await layerv_client.create_qurl(
-                    api_key=api_key,
-                    target_url=url,
-                    expires_in=analysis.expires_in,
-                    description=analysis.reason or f"Generated via Slack bot for user {user}",
-                )
-                results.append({
-                    "original_url": url,
-                    "qurl_link": qurl_response.qurl_link,
-                    "expires_at": qurl_response.expires_at,
-                })
-            except InvalidApiKeyError:
-                logger.error(f"Invalid API key for user {user}")
-                await say(f"<@{user}> {get_message('invalid_api_key', lang)}")
-                return
-            except Exception as e:
-                logger.error(f"Failed to create QURL for {url}: {e}")
-                errors.append(get_message("failed_item", lang, url=url, error=str(e)))
-
-        # Build response message
-        response_parts = [f"<@{user}>"]
-
-        if results:
-            response_parts.append(get_message("proxy_generated_header", lang))
-            for r in results:
-                response_parts.append(
-                    get_message(
-                        "proxy_item",
-                        lang,
-                        original_url=r["original_url"],
-                        qurl_link=r["qurl_link"],
-                        expires_at=r["expires_at"],
-                    )
+        # Generate QURLs for all valid URLs in one bulk call, keeping the original URL order
+        description = analysis.reason or f"Generated via Slack bot for user {user}"
+        valid_urls = [url for url in all_urls if normalized[url]]
+
+        # Hot aliases requested with the default expiry can be served from the pre-minted pool
+        qurl_by_url = {}
+        if qurl_pool.enabled and not analysis.expires_in:
+            for url in valid_urls:
+                pooled = qurl_pool.take(user, url)
+                if pooled is not None:
+                    qurl_by_url[url] = pooled
+        urls_to_create = [url for url in valid_urls if url not in qurl_by_url]
+
+        if not await admission_controller.admit_qurls(api_key, len(urls_to_create)):
+            rate_limited = get_message("rate_limited_qurls", lang, count=len(urls_to_create))
+            if qurl_by_url:
+                # Pooled links are already taken; hand them out rather than waste them
+                pooled_urls = list(qurl_by_url)
+                await reply(f"{build_reply(user, lang, pooled_urls, pooled_urls, qurl_by_url)}\n\n{rate_limited}")
+            else:
+                await reply(f"<@{user}> {rate_limited}")
+            return
+
+        # Multi-URL requests get a placeholder right away that fills in as QURLs arrive,
+        # unless they will all arrive together anyway (a single batch call)
+        if (
+            settings.progressive_reply_min_urls
+            and len(urls_to_create) >= settings.progressive_reply_min_urls
+            and layerv_client.reports_progress(len(urls_to_create))
+        ):
+            with stage_seconds.labels(stage="placeholder").time():
+                progress = await ProgressiveReply.post(
+                    say,
+                    app.client,
+                    build_reply(user, lang, all_urls, valid_urls, qurl_by_url),
+                    min_interval=settings.progressive_reply_interval,
                 )
 
-        if errors:
-            response_parts.append(get_message("failed_header", lang))
-            response_parts.extend([f"\n{e}" for e in errors])
+        def on_result(index: int, result: QURLResponse | Exception):
+            url = urls_to_create[index]
+            if isinstance(result, Exception):
+                errors_total.labels(stage="create_qurl", type=type(result).__name__).inc()
+                logger.error(f"Failed to create QURL for {url}: {result}")
+            qurl_by_url[url] = result
+            if progress is not None:
+                progress.update(build_reply(user, lang, all_urls, valid_urls, qurl_by_url))
+
+        try:
+            qurl_results = await layerv_client.create_qurls(
+                api_key=api_key,
+                requests=[
+                    QURLRequest(target_url=url, expires_in=analysis.expires_in, description=description)
+                    for url in urls_to_create
+                ],
+                owner=user,
+                on_result=on_result,
+            )
+        except InvalidApiKeyError:
+            logger.error(f"Invalid API key for user {user}")
+            qurl_pool.invalidate(user)
+            await reply(f"<@{user}> {get_message('invalid_api_key', lang)}")
+            return
 
-        await say("".join(response_parts))
+        qurl_by_url.update(zip(urls_to_create, qurl_results))
+        await reply(build_reply(user, lang, all_urls, valid_urls, qurl_by_url))
 
     except Exception as e:
+        errors_total.labels(stage="process_message", type=type(e).__name__).inc()
         logger.error(f"Error processing message: {e}")
-        await say(f"<@{user}> {get_message('processing_error', lang, error=str(e))}")
+        await reply(f"<@{user}> {get_message('processing_error', lang, error=str(e))}")
+
+
+def build_reply(user: str, lang: str, all_urls: list[str], valid_urls: list[str], qurl_by_url: dict) -> str:
+    """
+    Build the reply listing generated QURLs, failures and URLs still in progress.
+
+    Args:
+        user: Slack user ID to mention
+        lang: Reply language
+        all_urls: Every URL of the request, in order
+        valid_urls: URLs that QURLs are being created for
+        qurl_by_url: Results so far (QURLResponse or Exception) by URL
+    """
+    results = []
+    errors = []
+    pending = []
+
+    valid = set(valid_urls)
+    for url in all_urls:
+        qurl_response = qurl_by_url.get(url)
+        if url not in valid:
+            errors.append(get_message("invalid_url", lang, url=url))
+        elif qurl_response is None:
+            pending.append(get_message("pending_item", lang, url=url))
+        elif isinstance(qurl_response, Exception):
+            errors.append(get_message("failed_item", lang, url=url, error=str(qurl_response)))
+        else:
+            results.append((url, qurl_response))
+
+    response_parts = [f"<@{user}>"]
+
+    if results:
+        response_parts.append(get_message("proxy_generated_header", lang))
+        for url, qurl_response in results:
+            response_parts.append(
+                get_message(
+                    "proxy_item",
+                    lang,
+                    original_url=url,
+                    qurl_link=qurl_response.qurl_link,
+                    expires_at=qurl_response.expires_at,
+                )
+            )
+
+    if errors:
+        response_parts.append(get_message("failed_header", lang))
+        response_parts.extend([f"\n{e}" for e in errors])
+
+    if pending:
+        response_parts.append(get_message("pending_header", lang))
+        response_parts.extend([f"\n{p}" for p in pending])
+
+    return "".join(response_parts)
 
 
 @app.event("app_home_opened")
@@ -301,7 +592,38 @@ async def main():
     """Start the bot."""
     handler = AsyncSocketModeHandler(app, settings.slack_app_token)
     logger.info("Starting Slack QURL Bot with Claude AI (multilingual support)...")
-    await handler.start_async()
+    await user_store.start()
+    await layerv_client.start()
+    job_queue.start()
+    metrics_runner = None
+    if settings.metrics_port:
+        metrics_runner = await start_metrics_server(settings.metrics_host, settings.metrics_port)
+    background_tasks = []
+    if settings.alias_reload_interval > 0:
+        background_tasks.append(asyncio.create_task(domain_resolver.watch(settings.alias_reload_interval)))
+    if qurl_pool.enabled:
+        background_tasks.append(asyncio.create_task(qurl_pool.run(settings.qurl_pool_refill_interval)))
+    if tracer.enabled:
+        background_tasks.append(asyncio.create_task(tracer.run(settings.tracing_flush_interval)))
+    # systemd stops the service with SIGTERM; shut down the same way as on Ctrl+C
+    asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, asyncio.current_task().cancel)
+    try:
+        await handler.start_async()
+    except asyncio.CancelledError:
+        logger.info("Shutting down...")
+    finally:
+        # Stop taking new events, then let queued messages finish
+        await handler.close_async()
+        await job_queue.drain(settings.job_drain_timeout)
+        for task in background_tasks:
+            task.cancel()
+        await qurl_pool.close()
+        await tracer.close()
+        await layerv_client.aclose()
+        await ai_analyzer.close()
+        await user_store.close()
+        if metrics_runner is not None:
+            await metrics_runner.cleanup()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,4 @@
+"""Microbenchmarks for the bot's pure hot-path functions.
+
+Run with `python -m benchmarks` from the repository root.
+"""
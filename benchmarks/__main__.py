@@ -0,0 +1,140 @@
+"""
+Run the microbenchmarks and compare them against the recorded baselines.
+
+    python -m benchmarks                 # compare, exit 1 on a regression
+    python -m benchmarks --update        # record new baselines
+    python -m benchmarks -k DomainResolver --large
+"""
+
+import argparse
+import json
+import logging
+import os
+import platform
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+# Settings are read at import time; give the required ones harmless values
+# so the suite runs without a .env (nothing here talks to Slack or Anthropic)
+os.environ.setdefault("SLACK_BOT_TOKEN", "xoxb-benchmark")
+os.environ.setdefault("SLACK_APP_TOKEN", "xapp-benchmark")
+os.environ.setdefault("ANTHROPIC_API_KEY", "sk-ant-benchmark")
+os.environ.setdefault("ENCRYPTION_SECRET", "benchmark-secret")
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from benchmarks.cases import Case, all_cases  # noqa: E402
+
+# Per-call INFO logs (e.g. "Saved API key") would drown the report
+logging.disable(logging.INFO)
+
+BASELINES_FILE = Path(__file__).parent / "baselines.json"
+
+# A case regresses when it is this much slower than its baseline. Timings on
+# shared machines vary by 20-40% between runs, so only larger slowdowns count
+DEFAULT_THRESHOLD = 0.5
+
+
+def measure(case: Case, repeat: int, min_time: float) -> float:
+    """
+    Time a case and return the best seconds per operation over `repeat` runs.
+
+    Each run calls the case enough times to take at least `min_time` seconds.
+    Setup (e.g. clearing a cache) runs before every call and is not timed.
+    """
+    def run(number: int) -> float:
+        elapsed = 0.0
+        for _ in range(number):
+            if case.setup:
+                case.setup()
+            start = time.perf_counter()
+            case.func()
+            elapsed += time.perf_counter() - start
+        return elapsed
+
+    number = 1
+    while (elapsed := run(number)) < min_time:
+        number = max(number * 2, int(number * min_time / max(elapsed, 1e-9)))
+    best = min(run(number) for _ in range(repeat))
+    return best / (number * case.ops)
+
+
+def format_time(seconds: float) -> str:
+    for unit, scale in (("s", 1), ("ms", 1e-3), ("us", 1e-6)):
+        if seconds >= scale:
+            return f"{seconds / scale:.2f}{unit}"
+    return f"{seconds / 1e-9:.0f}ns"
+
+
+def load_baselines() -> dict:
+    if not BASELINES_FILE.exists():
+        return {"cases": {}}
+    with open(BASELINES_FILE, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_baselines(baselines: dict, results: dict[str, float]):
+    for name, seconds in results.items():
+        case = baselines["cases"].setdefault(name, {})
+        case["seconds_per_op"] = float(f"{seconds:.4g}")
+    baselines["machine"] = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "processor": platform.processor() or platform.machine(),
+    }
+    baselines["recorded_at"] = datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+    with open(BASELINES_FILE, "w", encoding="utf-8") as f:
+        json.dump(baselines, f, indent=2, ensure_ascii=False, sort_keys=True)
+        f.write("\n")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks", description=__doc__.strip().splitlines()[0])
+    parser.add_argument("-k", "--filter", default="", help="Only run cases whose name contains this")
+    parser.add_argument("--large", action="store_true", help="Include the 100k-user cases")
+    parser.add_argument("--update", action="store_true", help="Record the results as the new baselines")
+    parser.add_argument("--threshold", type=float, default=None,
+                        help=f"Allowed slowdown for every case (default: per case, else {DEFAULT_THRESHOLD})")
+    parser.add_argument("--repeat", type=int, default=5, help="Timed runs per case (best is kept)")
+    parser.add_argument("--min-time", type=float, default=0.1, help="Minimum seconds per timed run")
+    args = parser.parse_args()
+
+    baselines = load_baselines()
+    results: dict[str, float] = {}
+    regressions = []
+
+    with tempfile.TemporaryDirectory(prefix="qurlbot-bench-") as tmp:
+        cases = [c for c in all_cases(Path(tmp), large=args.large) if args.filter in c.name]
+        print(f"{'case':<52} {'per op':>10} {'baseline':>10} {'change':>8}")
+        for case in cases:
+            seconds = measure(case, args.repeat, args.min_time)
+            results[case.name] = seconds
+            recorded = baselines["cases"].get(case.name)
+            if recorded is None:
+                print(f"{case.name:<52} {format_time(seconds):>10} {'-':>10} {'new':>8}")
+                continue
+            change = seconds / recorded["seconds_per_op"] - 1
+            threshold = args.threshold if args.threshold is not None else recorded.get("threshold", DEFAULT_THRESHOLD)
+            flag = "  REGRESSION" if change > threshold else ""
+            if flag:
+                regressions.append(case.name)
+            print(
+                f"{case.name:<52} {format_time(seconds):>10} "
+                f"{format_time(recorded['seconds_per_op']):>10} {change:>+8.0%}{flag}"
+            )
+
+    if args.update:
+        save_baselines(baselines, results)
+        print(f"Recorded {len(results)} baselines in {BASELINES_FILE}")
+        return 0
+    if regressions:
+        print(f"{len(regressions)} case(s) regressed beyond their threshold")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
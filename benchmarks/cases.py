@@ -0,0 +1,200 @@
+"""Benchmark cases and the synthetic data they run on."""
+
+import asyncio
+import json
+import random
+import string
+from collections.abc import Callable
+from dataclasses import dataclass
+from pathlib import Path
+
+# Fixed seed so every run measures the same inputs
+RANDOM = random.Random(1234)
+
+
+@dataclass
+class Case:
+    name: str
+    func: Callable[[], object]
+    ops: int = 1  # Operations per call, so results are reported per operation
+    setup: Callable[[], object] | None = None  # Run before every timed call (not timed)
+
+
+def _word(length: int = 8) -> str:
+    return "".join(RANDOM.choices(string.ascii_lowercase, k=length))
+
+
+def _domains(count: int) -> list[str]:
+    tlds = ["com", "org", "net", "io", "co.uk", "com.cn", "dev"]
+    return [f"{_word()}.{RANDOM.choice(tlds)}" for _ in range(count)]
+
+
+def _slack_message(url_count: int) -> str:
+    parts = ["please give me a qurl for"]
+    for i, domain in enumerate(_domains(url_count)):
+        kind = i % 3
+        if kind == 0:
+            parts.append(f"<https://{domain}/path/{i}|{domain}>")
+        elif kind == 1:
+            parts.append(f"https://{domain}/docs?page={i}")
+        else:
+            parts.append(domain)
+        parts.append(RANDOM.choice(["and", "plus", "also", "和"]))
+    return " ".join(parts)
+
+
+def _alias_catalog(count: int) -> dict[str, str]:
+    return {f"{_word(6)}{i}": f"https://{_word()}{i}.internal.example.com" for i in range(count)}
+
+
+def url_parser_cases() -> list[Case]:
+    from services import url_parser
+
+    short = _slack_message(3)
+    long = _slack_message(400)
+    urls = [f"https://{d}/a/b?c={i}" for i, d in enumerate(_domains(1000))]
+    bare = _domains(1000)
+
+    def clear_caches():
+        url_parser.normalize_and_validate.cache_clear()
+        url_parser._normalize_netloc.cache_clear()
+
+    def normalize_all():
+        for url in bare:
+            url_parser.normalize_url(url)
+
+    def validate_all():
+        for url in urls:
+            url_parser.is_valid_url(url)
+
+    return [
+        Case("url_parser.extract_urls[3 urls]", lambda: url_parser.extract_urls(short)),
+        Case("url_parser.extract_urls[400 urls]", lambda: url_parser.extract_urls(long)),
+        Case("url_parser.normalize_url[cold]", normalize_all, ops=len(bare), setup=clear_caches),
+        Case("url_parser.normalize_url[cached]", normalize_all, ops=len(bare)),
+        Case("url_parser.is_valid_url", validate_all, ops=len(urls)),
+    ]
+
+
+def app_cases() -> list[Case]:
+    import app
+
+    short = _slack_message(3)
+    long = _slack_message(400)
+    return [
+        Case("app.preprocess_slack_text[3 urls]", lambda: app.preprocess_slack_text(short)),
+        Case("app.preprocess_slack_text[400 urls]", lambda: app.preprocess_slack_text(long)),
+    ]
+
+
+def domain_resolver_cases(tmp_dir: Path) -> list[Case]:
+    from services.domain_resolver import DomainResolver
+
+    cases = []
+    for count in (1_000, 10_000):
+        aliases = _alias_catalog(count)
+        path = tmp_dir / f"aliases-{count}.json"
+        path.write_text(json.dumps(aliases), encoding="utf-8")
+        resolver = DomainResolver(path)
+        names = list(aliases)
+        lookups = [RANDOM.choice(names).upper() for _ in range(1000)] + [_word() for _ in range(1000)]
+        message = " ".join(RANDOM.choice(names) if i % 10 == 0 else _word() for i in range(200))
+
+        def resolve_all(resolver=resolver, lookups=lookups):
+            for name in lookups:
+                resolver.resolve(name)
+
+        cases += [
+            Case(f"DomainResolver.resolve[{count} aliases]", resolve_all, ops=len(lookups)),
+            Case(f"DomainResolver.find_all[{count} aliases]", lambda r=resolver, m=message: r.find_all(m)),
+            Case(f"DomainResolver.get_aliases_prompt[{count} aliases]", resolver.get_aliases_prompt),
+        ]
+    return cases
+
+
+def i18n_cases() -> list[Case]:
+    from services.i18n import get_message
+
+    def format_messages():
+        for lang in ("en", "zh", "zh-CN"):
+            get_message("proxy_item", lang, original_url="https://a.com", qurl_link="https://q", expires_at="x")
+            get_message("no_api_key", lang)
+
+    return [Case("i18n.get_message", format_messages, ops=6)]
+
+
+def user_store_cases(tmp_dir: Path, counts: tuple[int, ...]) -> list[Case]:
+    from services.storage import JsonFileBackend, SqliteBackend
+    from services.user_store import UserStore
+
+    loop = asyncio.new_event_loop()
+    cases = []
+
+    for count in counts:
+        user_ids = [f"U{i:08d}" for i in range(count)]
+        keys = [f"lv_live_{_word(32)}" for _ in range(count)]
+        sample = RANDOM.sample(range(count), min(count, 1000))
+
+        db_path = tmp_dir / f"users-{count}.db"
+        store = UserStore(backend=SqliteBackend(db_path))
+        loop.run_until_complete(store.start())
+
+        async def set_all(store=store, user_ids=user_ids, keys=keys):
+            for user_id, key in zip(user_ids, keys):
+                await store.set_api_key(user_id, key)
+
+        async def set_sample(store=store, user_ids=user_ids, keys=keys, sample=sample):
+            for i in sample:
+                await store.set_api_key(user_ids[i], keys[i])
+
+        async def get_sample(store=store, user_ids=user_ids, sample=sample):
+            for i in sample:
+                await store.get_api_key(user_ids[i])
+
+        # Populate every user once; the timed cases then work on a sample of them
+        loop.run_until_complete(set_all())
+
+        json_backend = JsonFileBackend(tmp_dir / f"users-{count}.json")
+        records = dict(store._users)
+
+        cases += [
+            Case(
+                f"UserStore.set_api_key[sqlite, {count} users]",
+                lambda f=set_sample: loop.run_until_complete(f()),
+                ops=len(sample),
+            ),
+            Case(
+                f"UserStore.get_api_key[cold, {count} users]",
+                lambda f=get_sample: loop.run_until_complete(f()),
+                ops=len(sample),
+                setup=store.clear_key_cache,
+            ),
+            Case(
+                f"UserStore.get_api_key[cached, {count} users]",
+                lambda f=get_sample: loop.run_until_complete(f()),
+                ops=len(sample),
+            ),
+            Case(
+                f"UserStore.save[json, {count} users]",
+                lambda b=json_backend, r=records: b._write(r),
+            ),
+        ]
+    return cases
+
+
+def all_cases(tmp_dir: Path, large: bool = False) -> list[Case]:
+    """
+    Build the benchmark cases, creating their fixtures under `tmp_dir`.
+
+    Args:
+        tmp_dir: Scratch directory for alias files and user databases
+        large: Also build the 100k-user cases (slow to populate)
+    """
+    counts = (10_000, 100_000) if large else (10_000,)
+    return [
+        *url_parser_cases(),
+        *app_cases(),
+        *domain_resolver_cases(tmp_dir),
+        *i18n_cases(),
+        *user_store_cases(tmp_dir, counts),
+    ]
@@ -8,17 +8,108 @@ class Settings(BaseSettings):
 
     # Claude API
     anthropic_api_key: str
+    anthropic_model: str = "claude-3-haiku-20240307"
+    anthropic_timeout: float = 30.0
+    anthropic_max_concurrency: int = 10  # Max in-flight Claude requests
+
+    # Analysis result cache
+    analysis_cache_size: int = 1024
+    analysis_cache_ttl: float = 3600.0  # Seconds
+    analysis_cache_file: str | None = None  # Optional path for warm starts
 
     # LayerV API
     layerv_api_url: str = "https://api.layerv.xyz"
     layerv_api_key: str | None = None  # Optional global API key
+    layerv_timeout: float = 30.0
+    layerv_connect_timeout: float = 5.0
+    layerv_max_connections: int = 100
+    layerv_max_keepalive_connections: int = 20
+    layerv_keepalive_expiry: float = 30.0  # Seconds an idle connection is kept open
+    layerv_http2: bool = False  # Requires the "h2" package
+    layerv_batch_size: int = 50  # Max items per /v1/qurl/batch request
+
+    # Retry and circuit breaker for LayerV / Claude calls
+    retry_max_attempts: int = 3
+    retry_base_delay: float = 0.2  # Seconds, doubled on each retry (with jitter)
+    retry_max_delay: float = 5.0  # Longer Retry-After values fail immediately
+    circuit_failure_threshold: int = 5  # Consecutive failures before failing fast
+    circuit_reset_timeout: float = 30.0  # Seconds before a trial call is let through
+
+    # Rate limits (token buckets, a rate of 0 disables the limiter)
+    rate_limit_user_per_minute: float = 20
+    rate_limit_user_burst: float = 5
+    rate_limit_global_per_minute: float = 600
+    rate_limit_global_burst: float = 50
+    rate_limit_api_key_qurls_per_minute: float = 60  # QURLs per LayerV API key
+    rate_limit_api_key_burst: float = 20
+    rate_limit_max_wait: float = 5.0  # Seconds a request may be queued before it is shed
+
+    # Seconds between checks of domain_aliases.json for changes (0 disables)
+    alias_reload_interval: float = 5.0
+
+    # Progressive replies: post a placeholder and edit it as QURLs are created
+    progressive_reply_min_urls: int = 3  # Requests with fewer URLs get a single reply (0 disables)
+    progressive_reply_interval: float = 1.0  # Min seconds between edits of one message
+    progressive_reply_updates_per_minute: float = 50  # chat.update budget for the whole process
+
+    # Message processing worker pool
+    job_workers: int = 16
+    job_queue_max_depth: int = 200  # Queued jobs before new ones are shed
+    job_drain_timeout: float = 30.0  # Seconds to finish queued work on shutdown
+
+    # Slack event redelivery dedupe
+    event_dedupe_ttl: float = 600.0  # Seconds an event ID is remembered
+    event_dedupe_size: int = 10000
+    event_dedupe_shared: bool = False  # Also dedupe across processes via the redis user store
+
+    # Comma-separated Slack user IDs allowed to run admin commands
+    admin_user_ids: str = ""
 
     # QURL defaults
     qurl_default_expires_in: str = "30m"
+    qurl_max_concurrency: int = 32  # Max concurrent create_qurl calls overall
+    qurl_max_concurrency_per_user: int = 4  # Max concurrent create_qurl calls per user
+
+    # Pre-minted QURL pool for hot aliases (disabled while qurl_pool_aliases is empty)
+    qurl_pool_aliases: str = ""  # Comma-separated alias names from domain_aliases.json
+    qurl_pool_size: int = 2  # Unused links kept per alias per user
+    qurl_pool_min_remaining: float = 300.0  # Seconds of validity a pooled link must have left
+    qurl_pool_max_users: int = 200
+    qurl_pool_user_idle: float = 3600.0  # Seconds without a request before a user is dropped
+    qurl_pool_refill_interval: float = 60.0
 
     # Encryption secret for storing user API keys
     encryption_secret: str = "slack-qurl-bot-default-secret"
 
+    # User API key storage: "sqlite" (data/users.db), "json" (data/users.json)
+    # or "redis" (shared by several bot processes, requires the "redis" package).
+    # An existing users.json is migrated into SQLite on first start.
+    user_store_backend: str = "sqlite"
+    redis_url: str = "redis://localhost:6379/0"
+    redis_key_prefix: str = "qurlbot:"
+    shared_user_cache_size: int = 10000  # Records (and misses) kept locally with the redis backend
+
+    # In-memory cache of decrypted API keys (set either value to 0 to disable)
+    key_cache_ttl: float = 300.0  # Seconds
+    key_cache_size: int = 1024
+
+    # Prometheus metrics endpoint (GET /metrics), disabled while the port is 0
+    metrics_host: str = "127.0.0.1"
+    metrics_port: int = 0
+
+    # Request tracing, exported as OTLP/JSON to a file or a collector's /v1/traces
+    tracing_exporter: str = ""  # "file", "otlp" or empty to disable
+    tracing_file: str = "data/traces.jsonl"
+    tracing_otlp_endpoint: str = "http://127.0.0.1:4318/v1/traces"
+    tracing_sample_rate: float = 1.0  # Fraction of Slack events traced
+    tracing_flush_interval: float = 5.0  # Seconds between exports
+    tracing_max_queue: int = 10000  # Finished spans kept for export (oldest dropped)
+
+    # /profile admin command
+    profile_max_seconds: float = 60.0
+    profile_sample_interval: float = 0.005  # Seconds between stack samples
+    profile_stall_threshold: float = 0.1  # Loop heartbeat delay (s) that counts as a stall
+
     class Config:
         env_file = ".env"
 
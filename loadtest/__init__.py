@@ -0,0 +1,4 @@
+"""Offline end-to-end load test for the bot.
+
+Run with `python -m loadtest` from the repository root.
+"""
@@ -0,0 +1,378 @@
+"""
+Load-test the whole bot offline.
+
+The real Bolt app handles fake Socket Mode event envelopes. Local stubs
+stand in for Anthropic, LayerV and the Slack Web API. Messages are
+replayed from a JSONL corpus at a target rate, and the run reports
+throughput, latency percentiles, event-loop lag and upstream call counts.
+
+    python -m loadtest --corpus requests.jsonl --rate 20 --duration 30
+    python -m loadtest --claude-latency 1.5 --claude-error-rate 0.05 --urls-per-message 3
+
+Bot settings (JOB_WORKERS, ANTHROPIC_MAX_CONCURRENCY, ...) are read from the
+environment and .env as usual; only the upstream URLs are overridden.
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import sys
+import tempfile
+import time
+import uuid
+from dataclasses import dataclass, field
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from loadtest.stubs import AnthropicStub, LayerVStub, SlackStub, UpstreamBehavior  # noqa: E402
+
+TEXT_FIELDS = ("text", "body", "title")
+
+
+@dataclass
+class EventRecord:
+    channel: str
+    sent_at: float
+    acked_at: float = 0.0
+    error: str | None = None
+
+
+@dataclass
+class LagMonitor:
+    """Measure how late the event loop runs a callback scheduled every `interval` seconds."""
+
+    interval: float = 0.01
+    lags: list[float] = field(default_factory=list)
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            self.lags.append(max(0.0, loop.time() - expected))
+
+
+def histogram_means(metric) -> dict[str, dict]:
+    """Count and mean of each labelled series of a metrics Histogram, read through `collect()`."""
+    series: dict[str, dict] = {}
+    for labels, value, *suffix in metric.collect()[3]:
+        if suffix and suffix[0] in ("_sum", "_count"):
+            name = ",".join(labels.values())
+            series.setdefault(name, {})[suffix[0][1:]] = value
+    return {
+        name: {"count": int(s["count"]), "mean": s["sum"] / s["count"] if s["count"] else 0.0}
+        for name, s in series.items()
+    }
+
+
+def percentile(values: list[float], p: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p / 100))]
+
+
+def load_corpus(path: Path, text_field: str | None) -> list[str]:
+    """Read message texts from a JSONL file (first of text/body/title unless `text_field` is given)."""
+    texts = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            if isinstance(record, str):
+                texts.append(record)
+                continue
+            fields = (text_field,) if text_field else TEXT_FIELDS
+            text = next((record[name] for name in fields if record.get(name)), None)
+            if text:
+                texts.append(str(text))
+    if not texts:
+        raise SystemExit(f"No messages found in {path}")
+    return texts
+
+
+def synthetic_urls(count: int, pool_size: int) -> list[str]:
+    """Pick URLs from a fixed pool so repeated links behave like real traffic (caches, coalescing)."""
+    return [f"https://site{random.randrange(pool_size)}.example.com/page" for _ in range(count)]
+
+
+def build_envelope(seq: int, text: str, user: str, direct: bool) -> tuple[str, dict]:
+    """Build the event_callback body Slack would deliver over Socket Mode."""
+    channel = f"{'D' if direct else 'C'}LOAD{seq:07d}"
+    ts = f"{time.time():.6f}"
+    if direct:
+        event = {"type": "message", "channel_type": "im", "text": text}
+    else:
+        event = {"type": "app_mention", "channel_type": "channel", "text": f"<@U0BOT> {text}"}
+    event |= {
+        "user": user,
+        "channel": channel,
+        "ts": ts,
+        "event_ts": ts,
+        "client_msg_id": str(uuid.uuid4()),
+    }
+    body = {
+        "token": "loadtest",
+        "team_id": "T0STUB",
+        "api_app_id": "A0STUB",
+        "event": event,
+        "type": "event_callback",
+        "event_id": f"EvLOAD{seq:07d}",
+        "event_time": int(time.time()),
+        "authorizations": [{"team_id": "T0STUB", "user_id": "U0BOT", "is_bot": True}],
+    }
+    return channel, body
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(prog="python -m loadtest", description=__doc__.strip().splitlines()[0])
+    traffic = parser.add_argument_group("traffic")
+    traffic.add_argument("--corpus", type=Path, default=Path("requests.jsonl"), help="JSONL file of messages")
+    traffic.add_argument("--field", default=None, help="JSON field holding the message text")
+    traffic.add_argument("--rate", type=float, default=10.0, help="Target events per second")
+    traffic.add_argument("--duration", type=float, default=30.0, help="Seconds to send for")
+    traffic.add_argument("--count", type=int, default=0, help="Send exactly this many events (overrides --duration)")
+    traffic.add_argument("--poisson", action="store_true", help="Exponential inter-arrival times instead of even spacing")
+    traffic.add_argument("--users", type=int, default=50, help="Distinct Slack users (all with an API key)")
+    traffic.add_argument("--dm-ratio", type=float, default=0.5, help="Fraction of events that are DMs (rest are mentions)")
+    traffic.add_argument("--urls-per-message", type=int, default=0, help="Synthetic URLs appended to each message")
+    traffic.add_argument("--url-pool", type=int, default=100, help="Distinct synthetic URLs to draw from")
+    traffic.add_argument("--drain-timeout", type=float, default=60.0, help="Seconds to wait for replies after sending")
+    traffic.add_argument("--seed", type=int, default=None, help="Random seed for a repeatable run")
+
+    for name, latency in (("claude", 0.8), ("layerv", 0.15), ("slack", 0.05)):
+        group = parser.add_argument_group(f"{name} stub")
+        group.add_argument(f"--{name}-latency", type=float, default=latency, help="Mean response time in seconds")
+        group.add_argument(f"--{name}-jitter", type=float, default=latency / 2, help="± uniform jitter in seconds")
+        group.add_argument(f"--{name}-error-rate", type=float, default=0.0, help="Fraction of requests that fail")
+        group.add_argument(f"--{name}-error-status", type=int, default=529 if name == "claude" else 500)
+    parser.add_argument("--no-layerv-batch", action="store_true", help="Stub LayerV without /v1/qurl/batch")
+
+    parser.add_argument("--json", type=Path, default=None, help="Also write the report as JSON")
+    parser.add_argument("-v", "--verbose", action="store_true", help="Show the bot's INFO logs")
+    return parser.parse_args()
+
+
+def behavior(args: argparse.Namespace, name: str) -> UpstreamBehavior:
+    return UpstreamBehavior(
+        latency=getattr(args, f"{name}_latency"),
+        jitter=getattr(args, f"{name}_jitter"),
+        error_rate=getattr(args, f"{name}_error_rate"),
+        error_status=getattr(args, f"{name}_error_status"),
+    )
+
+
+async def run(args: argparse.Namespace) -> dict:
+    texts = load_corpus(args.corpus, args.field)
+
+    claude = AnthropicStub(behavior(args, "claude"))
+    layerv = LayerVStub(behavior(args, "layerv"), batch=not args.no_layerv_batch)
+    slack = SlackStub(behavior(args, "slack"))
+    try:
+        for stub in (claude, layerv, slack):
+            await stub.start()
+        with tempfile.TemporaryDirectory(prefix="qurlbot-loadtest-") as tmp:
+            return await drive(args, texts, claude, layerv, slack, Path(tmp))
+    finally:
+        for stub in (claude, layerv, slack):
+            await stub.close()
+
+
+async def drive(
+    args: argparse.Namespace,
+    texts: list[str],
+    claude: AnthropicStub,
+    layerv: LayerVStub,
+    slack: SlackStub,
+    tmp_dir: Path,
+) -> dict:
+    """Start the bot against the running stubs, send the traffic and build the report."""
+    # Point the bot at the stubs before its settings and clients are created
+    os.environ["ANTHROPIC_BASE_URL"] = claude.url
+    os.environ["LAYERV_API_URL"] = layerv.url
+    os.environ.setdefault("SLACK_BOT_TOKEN", "xoxb-loadtest")
+    os.environ.setdefault("SLACK_APP_TOKEN", "xapp-loadtest")
+    os.environ.setdefault("ANTHROPIC_API_KEY", "sk-ant-loadtest")
+
+    import app as bot
+    from slack_bolt.request.async_request import AsyncBoltRequest
+    from services.ai_analyzer import ai_analyzer
+    from services.job_queue import job_queue
+    from services.layerv import layerv_client
+    from services.metrics import job_wait_seconds, stage_seconds
+    from services.rate_limiter import admission_controller
+    from services.storage import SqliteBackend
+    from services.user_store import user_store
+
+    # Keep the test users out of the real user database
+    user_store._backend = SqliteBackend(tmp_dir / "users.db")
+    bot.app.client.base_url = f"{slack.url}/api/"
+
+    await user_store.start()
+    await layerv_client.start()
+    job_queue.start()
+    try:
+        users = [f"ULOAD{i:05d}" for i in range(args.users)]
+        for user in users:
+            await user_store.set_api_key(user, f"lv_live_loadtest_{user.lower()}")
+
+        monitor = LagMonitor()
+        monitor_task = asyncio.create_task(monitor.run())
+        records: list[EventRecord] = []
+        dispatches: set[asyncio.Task] = set()
+
+        async def dispatch(record: EventRecord, body: dict):
+            try:
+                response = await bot.app.async_dispatch(AsyncBoltRequest(body=body, mode="socket_mode"))
+                if response.status != 200:
+                    record.error = f"ack status {response.status}"
+            except Exception as e:
+                record.error = f"{type(e).__name__}: {e}"
+            record.acked_at = time.perf_counter()
+
+        total = args.count or int(args.rate * args.duration)
+        print(f"Sending {total} events at {args.rate}/s from {len(texts)} corpus messages...", file=sys.stderr)
+        started = time.perf_counter()
+        next_at = started
+        for seq in range(total):
+            delay = next_at - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            next_at += random.expovariate(args.rate) if args.poisson else 1 / args.rate
+
+            text = texts[seq % len(texts)]
+            if args.urls_per_message:
+                text = f"{text} qurl {' '.join(synthetic_urls(args.urls_per_message, args.url_pool))}"
+            channel, body = build_envelope(seq, text, random.choice(users), random.random() < args.dm_ratio)
+            record = EventRecord(channel=channel, sent_at=time.perf_counter())
+            records.append(record)
+            task = asyncio.create_task(dispatch(record, body))
+            dispatches.add(task)
+            task.add_done_callback(dispatches.discard)
+        sent_seconds = time.perf_counter() - started
+
+        # Wait for every handler to ack and every queued job to finish
+        deadline = time.perf_counter() + args.drain_timeout
+        while dispatches or job_queue.depth or job_queue.active:
+            if time.perf_counter() > deadline:
+                print("Drain timeout reached, reporting what finished", file=sys.stderr)
+                break
+            await asyncio.sleep(0.05)
+        # Let in-flight Slack responses land in the stub
+        await asyncio.sleep(0.1)
+        monitor_task.cancel()
+
+        first_reply, last_reply, ack = [], [], []
+        unanswered = 0
+        finished_at = started
+        for record in records:
+            if record.acked_at:
+                ack.append(record.acked_at - record.sent_at)
+            writes = slack.writes.get(record.channel)
+            if not writes:
+                unanswered += 1
+                continue
+            first_reply.append(writes[0] - record.sent_at)
+            last_reply.append(writes[-1] - record.sent_at)
+            finished_at = max(finished_at, writes[-1])
+
+        def summary(values: list[float]) -> dict:
+            return {
+                "p50": percentile(values, 50),
+                "p90": percentile(values, 90),
+                "p99": percentile(values, 99),
+                "max": max(values, default=0.0),
+            }
+
+        answered = len(records) - unanswered
+        report = {
+            "events": {
+                "sent": len(records),
+                "answered": answered,
+                "unanswered": unanswered,
+                "dispatch_errors": sum(1 for r in records if r.error),
+                "target_rate": args.rate,
+                "send_rate": len(records) / sent_seconds if sent_seconds else 0.0,
+                "throughput": answered / (finished_at - started) if finished_at > started else 0.0,
+            },
+            "latency_seconds": {
+                "ack": summary(ack),
+                "first_reply": summary(first_reply),
+                "final_reply": summary(last_reply),
+            },
+            "event_loop_lag_seconds": summary(monitor.lags),
+            "stage_seconds": histogram_means(stage_seconds),
+            "job_wait_seconds": histogram_means(job_wait_seconds),
+            "upstream_calls": {
+                stub.name: {"calls": dict(stub.calls), "errors": dict(stub.errors)}
+                for stub in (claude, layerv, slack)
+            },
+            "bot": {
+                "analysis_cache": ai_analyzer.cache.stats(),
+                "api_key_cache": user_store.key_cache_stats(),
+                "shed_queue_full": job_queue.shed_count,
+                "shed_rate_limited": admission_controller.shed_count,
+            },
+        }
+        report["upstream_calls"]["layerv"]["batch_items"] = layerv.batch_items
+        return report
+    finally:
+        await job_queue.drain(5)
+        await layerv_client.aclose()
+        await ai_analyzer.close()
+        await user_store.close()
+
+
+def print_report(report: dict):
+    events = report["events"]
+    print(
+        f"\nEvents: {events['sent']} sent ({events['send_rate']:.1f}/s, target {events['target_rate']:g}/s), "
+        f"{events['answered']} answered, {events['unanswered']} unanswered, "
+        f"{events['dispatch_errors']} dispatch errors"
+    )
+    print(f"Throughput: {events['throughput']:.1f} replies/s\n")
+
+    print(f"{'latency (ms)':<22} {'p50':>9} {'p90':>9} {'p99':>9} {'max':>9}")
+    rows = {**report["latency_seconds"], "event loop lag": report["event_loop_lag_seconds"]}
+    for name, values in rows.items():
+        print(f"{name:<22} " + " ".join(f"{values[k] * 1000:>9.1f}" for k in ("p50", "p90", "p99", "max")))
+
+    print(f"\n{'mean (ms)':<22} {'count':>9} {'mean':>9}")
+    for prefix, key in (("", "stage_seconds"), ("wait ", "job_wait_seconds")):
+        for name, values in report[key].items():
+            print(f"{prefix + name:<22} {values['count']:>9} {values['mean'] * 1000:>9.1f}")
+
+    print("\nUpstream calls:")
+    for name, stats in report["upstream_calls"].items():
+        calls = ", ".join(f"{endpoint}={count}" for endpoint, count in sorted(stats["calls"].items()))
+        errors = sum(stats["errors"].values())
+        extra = f", {stats['batch_items']} batch items" if stats.get("batch_items") else ""
+        print(f"  {name:<10} {calls or '-'} ({errors} injected errors{extra})")
+
+    bot = report["bot"]
+    print(
+        f"\nBot: analysis cache {bot['analysis_cache']['hits']} hits / {bot['analysis_cache']['misses']} misses, "
+        f"key cache {bot['api_key_cache']['hits']} hits / {bot['api_key_cache']['misses']} misses, "
+        f"shed {bot['shed_queue_full']} (queue full) + {bot['shed_rate_limited']} (rate limited)"
+    )
+
+
+def main():
+    args = parse_args()
+    if args.seed is not None:
+        random.seed(args.seed)
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.WARNING)
+    report = asyncio.run(run(args))
+    print_report(report)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,215 @@
+"""Local stand-ins for the Anthropic, LayerV and Slack Web APIs."""
+
+import asyncio
+import itertools
+import json
+import random
+import re
+import time
+from collections import Counter
+from dataclasses import dataclass
+
+from aiohttp import web
+
+from services.i18n import detect_language
+
+# Matches what the bot's own regex fallback would find; the stub "model" only needs to be plausible
+URL_PATTERN = re.compile(r"(?:https?://)?(?:[a-z0-9-]+\.)+[a-z]{2,}(?:/[^\s<>|]*)?", re.IGNORECASE)
+
+
+@dataclass
+class UpstreamBehavior:
+    """Latency and failure injection for one stub upstream."""
+
+    latency: float = 0.0  # Mean seconds per response
+    jitter: float = 0.0  # Latency is drawn uniformly from latency ± jitter
+    error_rate: float = 0.0  # Fraction of requests answered with `error_status`
+    error_status: int = 500
+
+    async def delay(self):
+        seconds = max(0.0, self.latency + random.uniform(-self.jitter, self.jitter))
+        if seconds:
+            await asyncio.sleep(seconds)
+
+    def should_fail(self) -> bool:
+        return self.error_rate > 0 and random.random() < self.error_rate
+
+
+class StubServer:
+    """One aiohttp stub server on a free local port, counting the calls it serves."""
+
+    def __init__(self, name: str, behavior: UpstreamBehavior):
+        self.name = name
+        self.behavior = behavior
+        self.calls: Counter[str] = Counter()
+        self.errors: Counter[str] = Counter()
+        self.app = web.Application()
+        self._runner: web.AppRunner | None = None
+        self.port = 0
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.port}"
+
+    async def start(self):
+        self._runner = web.AppRunner(self.app, access_log=None)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, "127.0.0.1", 0).start()
+        self.port = self._runner.addresses[0][1]
+
+    async def close(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
+
+    async def _serve(self, endpoint: str) -> web.Response | None:
+        """Count the call, wait out the latency and return an injected error, if any."""
+        self.calls[endpoint] += 1
+        await self.behavior.delay()
+        if self.behavior.should_fail():
+            self.errors[endpoint] += 1
+            return web.json_response(
+                {"error": {"type": "stub_error", "detail": "injected failure", "message": "injected failure"}},
+                status=self.behavior.error_status,
+            )
+        return None
+
+
+class AnthropicStub(StubServer):
+    """
+    POST /v1/messages answering in the JSON format the analysis prompt asks for.
+
+    URLs are picked out of the user message with a regex and every message
+    with a URL "wants a proxy", so replies exercise the QURL path.
+    """
+
+    def __init__(self, behavior: UpstreamBehavior):
+        super().__init__("anthropic", behavior)
+        self.app.router.add_post("/v1/messages", self.messages)
+
+    async def messages(self, request: web.Request) -> web.Response:
+        body = await request.json()
+        if (error := await self._serve("messages")) is not None:
+            return error
+        text = body["messages"][-1]["content"]
+        if isinstance(text, list):
+            text = " ".join(block.get("text", "") for block in text)
+        text = text.split("\n\n", 1)[-1]
+        urls = URL_PATTERN.findall(text)
+        analysis = {
+            "language": detect_language(text),
+            "urls": urls,
+            "wants_proxy": bool(urls),
+            "expires_in": None,
+            "reason": None,
+        }
+        return web.json_response({
+            "id": f"msg_stub_{self.calls['messages']}",
+            "type": "message",
+            "role": "assistant",
+            "model": body.get("model", "stub"),
+            "content": [{"type": "text", "text": json.dumps(analysis)}],
+            "stop_reason": "end_turn",
+            "stop_sequence": None,
+            "usage": {"input_tokens": len(text) // 4, "output_tokens": 40},
+        })
+
+
+class LayerVStub(StubServer):
+    """
+    POST /v1/qurl, and /v1/qurl/batch unless `batch` is False (then 404, like older servers).
+
+    Each QURL link ends in `#<target_url>` so callers can check which request
+    it answers. Targets in `fail_targets` are rejected (400, or a per-item
+    error in a batch).
+    """
+
+    def __init__(self, behavior: UpstreamBehavior, batch: bool = True, fail_targets: set[str] | None = None):
+        super().__init__("layerv", behavior)
+        self.batch = batch
+        self.fail_targets = fail_targets or set()
+        self.batch_items = 0
+        self._ids = itertools.count()
+        self.app.router.add_post("/v1/qurl", self.create)
+        self.app.router.add_post("/v1/qurl/batch", self.create_batch)
+
+    def _qurl(self, target_url: str) -> dict:
+        n = next(self._ids)
+        return {
+            "resource_id": f"r_stub_{n}",
+            "qurl_link": f"https://qurl.stub/q/{n}#{target_url}",
+            "qurl_site": "qurl.stub",
+            "expires_at": "2099-01-01T00:00:00Z",
+        }
+
+    def _rejection(self) -> dict:
+        return {"error": {"type": "invalid_target", "detail": "target rejected by stub"}}
+
+    async def create(self, request: web.Request) -> web.Response:
+        body = await request.json()
+        if (error := await self._serve("qurl")) is not None:
+            return error
+        if body["target_url"] in self.fail_targets:
+            return web.json_response(self._rejection(), status=400)
+        return web.json_response({"data": self._qurl(body["target_url"])}, status=201)
+
+    async def create_batch(self, request: web.Request) -> web.Response:
+        if not self.batch:
+            self.calls["qurl_batch_unsupported"] += 1
+            return web.json_response({"error": {"detail": "not found"}}, status=404)
+        body = await request.json()
+        if (error := await self._serve("qurl_batch")) is not None:
+            return error
+        items = body.get("items", [])
+        self.batch_items += len(items)
+        return web.json_response({
+            "data": [
+                self._rejection() if item["target_url"] in self.fail_targets else self._qurl(item["target_url"])
+                for item in items
+            ],
+        }, status=207)
+
+
+class SlackStub(StubServer):
+    """
+    The Slack Web API methods the bot calls (auth.test, chat.postMessage, chat.update).
+
+    Every write is recorded per channel with its arrival time, so the load
+    test can tell when the reply to each event was first and last written.
+    """
+
+    def __init__(self, behavior: UpstreamBehavior):
+        super().__init__("slack", behavior)
+        self.writes: dict[str, list[float]] = {}
+        self._ts = itertools.count(1)
+        self.app.router.add_post("/api/{method}", self.api)
+
+    async def api(self, request: web.Request) -> web.Response:
+        method = request.match_info["method"]
+        if request.content_type == "application/json":
+            args = await request.json()
+        else:
+            args = dict(await request.post()) | dict(request.query)
+        if (error := await self._serve(method)) is not None:
+            return error
+
+        if method == "auth.test":
+            return web.json_response({
+                "ok": True,
+                "url": "https://stub.slack.com/",
+                "team": "stub",
+                "team_id": "T0STUB",
+                "user": "qurlbot",
+                "user_id": "U0BOT",
+                "bot_id": "B0BOT",
+            })
+        if method in ("chat.postMessage", "chat.update"):
+            channel = args.get("channel", "")
+            self.writes.setdefault(channel, []).append(time.perf_counter())
+            ts = args.get("ts") or f"{int(time.time())}.{next(self._ts):06d}"
+            return web.json_response({
+                "ok": True,
+                "channel": channel,
+                "ts": ts,
+                "message": {"type": "message", "text": args.get("text", ""), "ts": ts},
+            })
+        return web.json_response({"ok": True})
@@ -1,14 +1,27 @@
+import asyncio
 import json
 import logging
-from dataclasses import dataclass
+from dataclasses import dataclass, replace
 
 import anthropic
 
 from config import settings
+from services.analysis_cache import AnalysisCache
 from services.domain_resolver import domain_resolver
+from services.resilience import call_with_resilience, get_breaker, parse_retry_after
+from services.singleflight import SingleFlight
+from services.tracing import SPAN_KIND_CLIENT, tracer
+from services.url_parser import strip_urls
 
 logger = logging.getLogger(__name__)
 
+# Anthropic only caches prompts of at least this many tokens (by model family);
+# shorter prompts marked with cache_control are simply processed uncached
+PROMPT_CACHE_MIN_TOKENS = {"haiku-4-5": 4096, "haiku": 2048}
+DEFAULT_PROMPT_CACHE_MIN_TOKENS = 1024
+# Rough characters per token, used to estimate the prompt length
+CHARS_PER_TOKEN = 4
+
 SYSTEM_PROMPT_TEMPLATE = """You are an intelligent assistant responsible for analyzing user messages and extracting structured information.
 
 Your task is to extract the following information from user messages:
@@ -71,6 +84,39 @@ Examples:
 - Input: "CRM proxy please, 7 days" → {{"language": "en", "urls": ["https://crm.mycompany.com"], "wants_proxy": true, "expires_in": "7d", "reason": null}}"""
 
 
+def _is_retryable_error(e: Exception) -> bool:
+    """Connection errors, timeouts, rate limits and server/overload errors."""
+    if isinstance(e, anthropic.APIConnectionError):
+        return True
+    if isinstance(e, anthropic.APIStatusError):
+        return e.status_code == 429 or e.status_code >= 500
+    return False
+
+
+def _is_upstream_failure(e: Exception) -> bool:
+    """Errors that count against Anthropic's health (not rate limits or bad requests)."""
+    if isinstance(e, anthropic.APIConnectionError):
+        return True
+    if isinstance(e, anthropic.APIStatusError):
+        return e.status_code >= 500
+    return False
+
+
+def _get_retry_after(e: Exception) -> float | None:
+    response = getattr(e, "response", None)
+    if response is None:
+        return None
+    return parse_retry_after(response.headers.get("retry-after"))
+
+
+def _prompt_cache_min_tokens(model: str) -> int:
+    """Minimum prompt length, in tokens, that Anthropic caches for a model."""
+    for family, min_tokens in PROMPT_CACHE_MIN_TOKENS.items():
+        if family in model:
+            return min_tokens
+    return DEFAULT_PROMPT_CACHE_MIN_TOKENS
+
+
 @dataclass
 class AnalysisResult:
     language: str
@@ -84,12 +130,63 @@ class AIAnalyzer:
     """Use Claude to analyze user messages."""
 
     def __init__(self):
-        self.client = anthropic.Anthropic(api_key=settings.anthropic_api_key)
+        # A single async client keeps its HTTP connection pool alive across requests
+        self.client = anthropic.AsyncAnthropic(
+            api_key=settings.anthropic_api_key,
+            timeout=settings.anthropic_timeout,
+            # Retries are handled by call_with_resilience
+            max_retries=0,
+        )
+        self.breaker = get_breaker("anthropic")
+        # Bound the number of in-flight Claude requests
+        self._semaphore = asyncio.Semaphore(settings.anthropic_max_concurrency)
+        self.cache = AnalysisCache(
+            max_size=settings.analysis_cache_size,
+            ttl=settings.analysis_cache_ttl,
+            path=settings.analysis_cache_file,
+        )
+        self.cache.load()
+        self._in_flight = SingleFlight("analyze")
+        self._system_prompt: list[dict] = []
+        self._system_prompt_version: str | None = None
+
+    async def close(self):
+        """Persist the result cache and close the underlying HTTP connection pool."""
+        self.cache.save()
+        await self.client.close()
+
+    def _get_system_prompt(self) -> list[dict]:
+        """
+        Get system prompt blocks with custom domain aliases.
 
-    def _get_system_prompt(self) -> str:
-        """Build system prompt with custom domain aliases."""
-        custom_aliases = domain_resolver.get_aliases_prompt()
-        return SYSTEM_PROMPT_TEMPLATE.format(custom_aliases=custom_aliases)
+        The prompt is only rebuilt when the alias catalog changes. It is marked
+        for Anthropic prompt caching only when it is long enough to be cached:
+        with a small alias catalog it is about 1.1k tokens, below the 2048-token
+        minimum of the default Haiku model, so there is nothing to save.
+        """
+        if self._system_prompt_version != domain_resolver.version:
+            custom_aliases = domain_resolver.get_aliases_prompt()
+            block = {"type": "text", "text": SYSTEM_PROMPT_TEMPLATE.format(custom_aliases=custom_aliases)}
+            if len(block["text"]) / CHARS_PER_TOKEN >= _prompt_cache_min_tokens(settings.anthropic_model):
+                block["cache_control"] = {"type": "ephemeral"}
+            self._system_prompt = [block]
+            self._system_prompt_version = domain_resolver.version
+        return self._system_prompt
+
+    async def _create_message(self, system_prompt: list[dict], text: str):
+        """Send one analysis request to Claude."""
+        async with self._semaphore:
+            return await self.client.messages.create(
+                model=settings.anthropic_model,
+                max_tokens=500,
+                system=system_prompt,
+                messages=[
+                    {
+                        "role": "user",
+                        "content": f"Analyze the following user message:\n\n{text}",
+                    }
+                ],
+            )
 
     def _resolve_custom_domains(self, urls: list[str], text: str) -> list[str]:
         """
@@ -102,17 +199,11 @@ class AIAnalyzer:
         Returns:
             Updated list of URLs with custom domains resolved
         """
-        resolved_urls = []
+        resolved_urls = list(urls)
 
-        for url in urls:
-            resolved_urls.append(url)
-
-        # Also check if any word in the text matches a custom alias
-        words = text.replace(",", " ").replace(".", " ").split()
-        for word in words:
-            resolved = domain_resolver.resolve(word)
-            if resolved and resolved not in resolved_urls:
-                # Check if this alias wasn't already captured
+        # Also check if any alias is mentioned in the text (outside of explicit URLs)
+        for resolved in domain_resolver.find_all(strip_urls(text)):
+            if resolved not in resolved_urls:
                 resolved_urls.append(resolved)
 
         return resolved_urls
@@ -127,20 +218,32 @@ class AIAnalyzer:
         Returns:
             AnalysisResult with extracted information including language
         """
+        with tracer.span("ai_analyzer.analyze") as span:
+            cache_key = AnalysisCache.make_key(text, domain_resolver.version)
+            cached = self.cache.get(cache_key)
+            if span is not None:
+                span.set_attribute("cache_hit", cached is not None)
+            if cached is not None:
+                logger.debug(f"Analysis cache hit: {cache_key[0]}")
+                return cached
+
+            # Identical messages analyzed concurrently share one Claude call
+            result = await self._in_flight.do(cache_key, lambda: self._analyze_uncached(text, cache_key))
+            return replace(result, urls=list(result.urls))
+
+    async def _analyze_uncached(self, text: str, cache_key: tuple[str, str]) -> AnalysisResult:
+        """Analyze a message with Claude and cache the result."""
         try:
             system_prompt = self._get_system_prompt()
 
-            message = self.client.messages.create(
-                model="claude-3-haiku-20240307",
-                max_tokens=500,
-                system=system_prompt,
-                messages=[
-                    {
-                        "role": "user",
-                        "content": f"Analyze the following user message:\n\n{text}",
-                    }
-                ],
-            )
+            with tracer.span("anthropic.messages.create", kind=SPAN_KIND_CLIENT, model=settings.anthropic_model):
+                message = await call_with_resilience(
+                    lambda: self._create_message(system_prompt, text),
+                    self.breaker,
+                    is_retryable=_is_retryable_error,
+                    is_failure=_is_upstream_failure,
+                    get_retry_after=_get_retry_after,
+                )
 
             response_text = message.content[0].text
             logger.debug(f"Claude response: {response_text}")
@@ -157,13 +260,15 @@ class AIAnalyzer:
             if "qurl" in text.lower():
                 wants_proxy = True
 
-            return AnalysisResult(
+            result = AnalysisResult(
                 language=data.get("language", "en"),
                 urls=urls,
                 wants_proxy=wants_proxy,
                 expires_in=data.get("expires_in"),
                 reason=data.get("reason"),
             )
+            self.cache.set(cache_key, result)
+            return result
 
         except json.JSONDecodeError as e:
             logger.error(f"Failed to parse Claude response: {e}")
@@ -0,0 +1,158 @@
+"""In-memory cache of message analysis results."""
+
+import json
+import logging
+import time
+from collections import OrderedDict
+from dataclasses import asdict, replace
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+from services.url_parser import TOKEN_PATTERN
+
+if TYPE_CHECKING:
+    from services.ai_analyzer import AnalysisResult
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_text(text: str) -> str:
+    """
+    Normalize message text for use as a cache key.
+
+    Whitespace is collapsed and the prose is casefolded, but URLs are kept as
+    written: paths and queries are case-sensitive, and two messages asking for
+    different URLs must never share a key (or an in-flight analysis).
+    """
+    parts = []
+    last_end = 0
+    for match in TOKEN_PATTERN.finditer(text):
+        parts.append(text[last_end:match.start()].casefold())
+        parts.append(match.group())
+        last_end = match.end()
+    parts.append(text[last_end:].casefold())
+    return " ".join("".join(parts).split())
+
+
+class AnalysisCache:
+    """Bounded LRU cache of AnalysisResult with per-entry TTL."""
+
+    def __init__(self, max_size: int = 1024, ttl: float = 3600.0, path: str | None = None):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.path = Path(path) if path else None
+        self.hits = 0
+        self.misses = 0
+        # key -> (expires_at, result)
+        self._entries: OrderedDict[tuple[str, str], tuple[float, "AnalysisResult"]] = OrderedDict()
+
+    @staticmethod
+    def make_key(text: str, catalog_version: str) -> tuple[str, str]:
+        """Build a cache key from the message text and alias catalog version."""
+        return normalize_text(text), catalog_version
+
+    def get(self, key: tuple[str, str]) -> "AnalysisResult | None":
+        """
+        Look up a cached result.
+
+        Args:
+            key: Key built with make_key()
+
+        Returns:
+            A copy of the cached AnalysisResult, or None on miss/expiry
+        """
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        expires_at, result = entry
+        if expires_at <= time.time():
+            del self._entries[key]
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        # Hand out a copy so callers can't mutate the cached entry
+        return replace(result, urls=list(result.urls))
+
+    def set(self, key: tuple[str, str], result: "AnalysisResult") -> None:
+        """Store a result, evicting the least recently used entry when full."""
+        if self.max_size <= 0:
+            return
+        self._entries[key] = (time.time() + self.ttl, replace(result, urls=list(result.urls)))
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        """Drop all entries."""
+        self._entries.clear()
+
+    def stats(self) -> dict:
+        """Return hit/miss counters and current size."""
+        total = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def load(self) -> None:
+        """Warm the cache from disk, skipping expired entries."""
+        if not self.path or not self.path.exists():
+            return
+
+        from services.ai_analyzer import AnalysisResult
+
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                records = json.load(f)
+        except Exception as e:
+            logger.error(f"Failed to load analysis cache: {e}")
+            return
+
+        now = time.time()
+        for record in records:
+            try:
+                if record["expires_at"] <= now:
+                    continue
+                key = (record["text"], record["version"])
+                self._entries[key] = (record["expires_at"], AnalysisResult(**record["result"]))
+            except (KeyError, TypeError) as e:
+                logger.warning(f"Skipping malformed analysis cache record: {e}")
+
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+        logger.info(f"Loaded {len(self._entries)} cached analysis results")
+
+    def save(self) -> None:
+        """Persist live entries to disk for the next warm start."""
+        if not self.path:
+            return
+
+        now = time.time()
+        records = [
+            {
+                "text": text,
+                "version": version,
+                "expires_at": expires_at,
+                "result": asdict(result),
+            }
+            for (text, version), (expires_at, result) in self._entries.items()
+            if expires_at > now
+        ]
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.path.with_suffix(self.path.suffix + ".tmp")
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(records, f, ensure_ascii=False)
+            tmp_path.replace(self.path)
+            logger.info(f"Saved {len(records)} cached analysis results to {self.path}")
+        except Exception as e:
+            logger.error(f"Failed to save analysis cache: {e}")
@@ -0,0 +1,36 @@
+"""Concurrency limits for fan-out work."""
+
+import asyncio
+from contextlib import asynccontextmanager
+
+
+class ConcurrencyLimiter:
+    """Cap in-flight work both globally and per key (e.g. per Slack user)."""
+
+    def __init__(self, global_limit: int, per_key_limit: int):
+        self.per_key_limit = per_key_limit
+        self._global = asyncio.Semaphore(global_limit)
+        # key -> [semaphore, number of holders/waiters]
+        self._per_key: dict[str, list] = {}
+
+    @asynccontextmanager
+    async def slot(self, key: str):
+        """Acquire one per-key slot, then one global slot, for the duration of the block."""
+        entry = self._per_key.get(key)
+        if entry is None:
+            entry = self._per_key[key] = [asyncio.Semaphore(self.per_key_limit), 0]
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                async with self._global:
+                    yield
+        finally:
+            entry[1] -= 1
+            if entry[1] == 0:
+                # Drop idle keys so the map doesn't grow with every user ever seen
+                self._per_key.pop(key, None)
+
+    def in_use(self, key: str) -> int:
+        """Number of tasks holding or waiting for a slot under this key."""
+        entry = self._per_key.get(key)
+        return entry[1] if entry else 0
@@ -1,8 +1,12 @@
 """Custom domain alias resolver."""
 
+import asyncio
+import hashlib
 import json
 import logging
 import os
+from collections import deque
+from dataclasses import dataclass, replace
 from pathlib import Path
 
 logger = logging.getLogger(__name__)
@@ -11,25 +15,254 @@ logger = logging.getLogger(__name__)
 ALIASES_FILE = Path(__file__).parent.parent / "domain_aliases.json"
 
 
+def _is_word_char(char: str) -> bool:
+    """ASCII letters and digits; CJK text has no word boundaries to respect."""
+    return char.isascii() and char.isalnum()
+
+
+class AliasMatcher:
+    """
+    Aho-Corasick automaton over case-folded aliases.
+
+    Finds every alias occurring in a text in a single pass, including
+    multi-word aliases and aliases glued to CJK characters.
+    """
+
+    def __init__(self, aliases: dict[str, str]):
+        # Trie as parallel lists: transitions, failure links and matched alias ids
+        self._goto: list[dict[str, int]] = [{}]
+        self._fail: list[int] = [0]
+        self._out: list[list[int]] = [[]]
+        self._patterns: list[tuple[str, str]] = []
+
+        for alias, url in aliases.items():
+            key = alias.casefold()
+            if not key:
+                continue
+            self._patterns.append((key, url))
+            self._insert(key, len(self._patterns) - 1)
+        self._build_failure_links()
+
+    def _insert(self, key: str, pattern_id: int):
+        state = 0
+        for char in key:
+            next_state = self._goto[state].get(char)
+            if next_state is None:
+                next_state = len(self._goto)
+                self._goto[state][char] = next_state
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append([])
+            state = next_state
+        self._out[state].append(pattern_id)
+
+    def _build_failure_links(self):
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fail = self._fail[state]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[next_state] = self._goto[fail].get(char, 0)
+                self._out[next_state] = self._out[next_state] + self._out[self._fail[next_state]]
+
+    def find(self, text: str) -> list[tuple[int, int, str]]:
+        """
+        Find aliases in text.
+
+        Matches are case-insensitive and must not be embedded in a longer ASCII
+        word ("HR" does not match inside "three"). Overlapping matches are
+        resolved leftmost-longest.
+
+        Args:
+            text: Text to search (positions refer to text.casefold())
+
+        Returns:
+            List of (start, end, url) tuples in order of appearance
+        """
+        folded = text.casefold()
+        goto, fail, out, patterns = self._goto, self._fail, self._out, self._patterns
+        candidates = []
+        state = 0
+        for i, char in enumerate(folded):
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            for pattern_id in out[state]:
+                key, url = patterns[pattern_id]
+                start, end = i - len(key) + 1, i + 1
+                if _is_word_char(key[0]) and start > 0 and _is_word_char(folded[start - 1]):
+                    continue
+                if _is_word_char(key[-1]) and end < len(folded) and _is_word_char(folded[end]):
+                    continue
+                candidates.append((start, end, url))
+
+        # Leftmost-longest, non-overlapping
+        candidates.sort(key=lambda m: (m[0], -m[1]))
+        matches = []
+        last_end = 0
+        for start, end, url in candidates:
+            if start >= last_end:
+                matches.append((start, end, url))
+                last_end = end
+        return matches
+
+
+def validate_aliases(data) -> dict[str, str]:
+    """
+    Validate a parsed alias catalog.
+
+    Raises:
+        ValueError: If the catalog is not a mapping of alias names to http(s) URLs
+    """
+    if not isinstance(data, dict):
+        raise ValueError("alias catalog must be a JSON object")
+    for alias, url in data.items():
+        if not alias.strip():
+            raise ValueError("alias names must not be empty")
+        if not isinstance(url, str) or not url.startswith(("http://", "https://")):
+            raise ValueError(f'alias "{alias}" must map to an http(s) URL')
+    return data
+
+
+def build_aliases_prompt(aliases: dict[str, str]) -> str:
+    """Format alias mappings for the AI prompt."""
+    if not aliases:
+        return ""
+
+    lines = ["Custom internal domain aliases (use these exact URLs):"]
+    for alias, url in aliases.items():
+        lines.append(f'  - "{alias}" → "{url}"')
+    return "\n".join(lines)
+
+
+@dataclass(frozen=True)
+class AliasCatalog:
+    """Immutable snapshot of the alias catalog and everything derived from it."""
+
+    aliases: dict[str, str]
+    version: str  # Content fingerprint, stable across restarts
+    revision: int  # Incremented on every reload that changed the catalog
+    index: dict[str, str]
+    matcher: AliasMatcher
+    prompt: str
+    mtime_ns: int = 0
+
+    @classmethod
+    def build(cls, aliases: dict[str, str], revision: int, mtime_ns: int = 0) -> "AliasCatalog":
+        payload = json.dumps(aliases, sort_keys=True, ensure_ascii=False)
+        return cls(
+            aliases=aliases,
+            version=hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16],
+            revision=revision,
+            index={alias.casefold(): url for alias, url in aliases.items()},
+            matcher=AliasMatcher(aliases),
+            prompt=build_aliases_prompt(aliases),
+            mtime_ns=mtime_ns,
+        )
+
+
 class DomainResolver:
     """Resolve custom domain aliases to full URLs."""
 
-    def __init__(self):
-        self.aliases: dict[str, str] = {}
+    def __init__(self, path: Path = ALIASES_FILE):
+        self.path = path
+        # Readers only ever dereference this once per call, reloads swap it atomically
+        self._catalog = AliasCatalog.build({}, revision=0)
+        # mtime of a file version that failed validation, so polling doesn't retry it
+        self._rejected_mtime_ns: int | None = None
         self.load_aliases()
 
+    @property
+    def aliases(self) -> dict[str, str]:
+        return self._catalog.aliases
+
+    @property
+    def version(self) -> str:
+        """Catalog fingerprint that downstream caches key on."""
+        return self._catalog.version
+
+    @property
+    def revision(self) -> int:
+        return self._catalog.revision
+
+    def _stat_mtime(self) -> int | None:
+        try:
+            return self.path.stat().st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+    def _read_catalog(self, mtime_ns: int) -> AliasCatalog:
+        """Read, validate and index the catalog file (blocking)."""
+        with open(self.path, "r", encoding="utf-8") as f:
+            aliases = validate_aliases(json.load(f))
+        return AliasCatalog.build(aliases, revision=self._catalog.revision + 1, mtime_ns=mtime_ns)
+
     def load_aliases(self):
         """Load domain aliases from config file."""
-        if ALIASES_FILE.exists():
+        mtime_ns = self._stat_mtime()
+        if mtime_ns is not None:
             try:
-                with open(ALIASES_FILE, "r", encoding="utf-8") as f:
-                    self.aliases = json.load(f)
+                self._catalog = self._read_catalog(mtime_ns)
                 logger.info(f"Loaded {len(self.aliases)} domain aliases")
             except Exception as e:
                 logger.error(f"Failed to load domain aliases: {e}")
-                self.aliases = {}
         else:
-            logger.warning(f"Domain aliases file not found: {ALIASES_FILE}")
+            logger.warning(f"Domain aliases file not found: {self.path}")
+
+    async def reload(self, force: bool = False) -> bool:
+        """
+        Reload the catalog if the file changed.
+
+        Parsing and indexing run in a worker thread; the new catalog is then
+        swapped in with a single assignment, so readers never block.
+
+        Args:
+            force: Reload even if the file's mtime did not change
+
+        Returns:
+            True if a new catalog version was swapped in
+
+        Raises:
+            ValueError: If the file is missing or invalid (the old catalog stays active)
+        """
+        mtime_ns = await asyncio.to_thread(self._stat_mtime)
+        if mtime_ns is None:
+            raise ValueError(f"alias file not found: {self.path}")
+        if not force and mtime_ns in (self._catalog.mtime_ns, self._rejected_mtime_ns):
+            return False
+
+        try:
+            catalog = await asyncio.to_thread(self._read_catalog, mtime_ns)
+        except json.JSONDecodeError as e:
+            self._rejected_mtime_ns = mtime_ns
+            raise ValueError(f"invalid JSON: {e}") from e
+        except ValueError:
+            self._rejected_mtime_ns = mtime_ns
+            raise
+
+        if catalog.version == self._catalog.version:
+            # Touched but unchanged, just remember the new mtime
+            self._catalog = replace(self._catalog, mtime_ns=mtime_ns)
+            return False
+
+        self._catalog = catalog
+        logger.info(
+            f"Reloaded {len(catalog.aliases)} domain aliases "
+            f"(revision {catalog.revision}, version {catalog.version})"
+        )
+        return True
+
+    async def watch(self, interval: float):
+        """Poll the alias file's mtime and reload when it changes."""
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.reload()
+            except Exception as e:
+                logger.error(f"Failed to reload domain aliases, keeping previous version: {e}")
 
     def resolve(self, name: str) -> str | None:
         """
@@ -42,11 +275,23 @@ class DomainResolver:
             The full URL if alias exists, None otherwise
         """
         # Case-insensitive lookup
-        name_lower = name.lower()
-        for alias, url in self.aliases.items():
-            if alias.lower() == name_lower:
-                return url
-        return None
+        return self._catalog.index.get(name.casefold())
+
+    def find_all(self, text: str) -> list[str]:
+        """
+        Find every alias mentioned in a message in one pass.
+
+        Args:
+            text: Message text
+
+        Returns:
+            Resolved URLs in order of appearance (deduplicated)
+        """
+        return list(dict.fromkeys(url for _, _, url in self._catalog.matcher.find(text)))
+
+    def find_matches(self, text: str) -> list[tuple[int, int, str]]:
+        """Find aliases with their (start, end) positions in text.casefold()."""
+        return self._catalog.matcher.find(text)
 
     def get_aliases_prompt(self) -> str:
         """
@@ -55,13 +300,7 @@ class DomainResolver:
         Returns:
             Formatted string of alias mappings
         """
-        if not self.aliases:
-            return ""
-
-        lines = ["Custom internal domain aliases (use these exact URLs):"]
-        for alias, url in self.aliases.items():
-            lines.append(f'  - "{alias}" → "{url}"')
-        return "\n".join(lines)
+        return self._catalog.prompt
 
 
 # Singleton instance
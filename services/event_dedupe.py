@@ -0,0 +1,100 @@
+"""Drop Slack event redeliveries before they reach the handlers."""
+
+import logging
+import time
+from collections import OrderedDict
+
+from config import settings
+from services.storage import StorageBackend
+from services.user_store import user_store
+
+logger = logging.getLogger(__name__)
+
+
+def event_keys(body: dict) -> list[str]:
+    """
+    Dedupe keys of a Slack event payload.
+
+    Retries of one delivery share the event_id. The client_msg_id catches the
+    same message arriving again as a new event; it is combined with the event
+    type because one message can legitimately produce both a "message" and an
+    "app_mention" event.
+    """
+    keys = []
+    event_id = body.get("event_id")
+    if event_id:
+        keys.append(f"event:{event_id}")
+    event = body.get("event") or {}
+    client_msg_id = event.get("client_msg_id")
+    if client_msg_id:
+        keys.append(f"msg:{event.get('type')}:{client_msg_id}")
+    return keys
+
+
+class EventDeduper:
+    """
+    Time-windowed, size-bounded index of recently seen event keys.
+
+    With a shared backend, keys are also claimed there so a redelivery that
+    lands on another bot process is dropped too.
+    """
+
+    def __init__(self, ttl: float, max_size: int, backend: StorageBackend | None = None):
+        self.ttl = ttl
+        self.max_size = max_size
+        self.backend = backend
+        # key -> monotonic expiry, oldest first
+        self._seen: OrderedDict[str, float] = OrderedDict()
+        self.duplicates = 0
+
+    def _expire(self, now: float):
+        while self._seen:
+            key, expires_at = next(iter(self._seen.items()))
+            if expires_at > now and len(self._seen) <= self.max_size:
+                break
+            del self._seen[key]
+
+    async def is_duplicate(self, keys: list[str]) -> bool:
+        """
+        Check whether an event was already seen, recording it if not.
+
+        Args:
+            keys: Dedupe keys of the event (see event_keys)
+
+        Returns:
+            True if any key was seen within the TTL
+        """
+        if not keys:
+            return False
+
+        now = time.monotonic()
+        self._expire(now)
+        duplicate = any(key in self._seen for key in keys)
+        # Record before awaiting the backend so concurrent local redeliveries are caught
+        for key in keys:
+            self._seen[key] = now + self.ttl
+            self._seen.move_to_end(key)
+        self._expire(now)
+
+        if not duplicate and self.backend is not None:
+            try:
+                for key in keys:
+                    if not await self.backend.claim(f"dedupe:{key}", self.ttl):
+                        duplicate = True
+                        break
+            except Exception as e:
+                # Processing an event twice beats dropping it
+                logger.warning(f"Shared event dedupe unavailable: {e}")
+
+        if duplicate:
+            self.duplicates += 1
+            logger.info(f"Dropping duplicate Slack event {keys[0]}")
+        return duplicate
+
+
+# Singleton instance
+event_deduper = EventDeduper(
+    ttl=settings.event_dedupe_ttl,
+    max_size=settings.event_dedupe_size,
+    backend=user_store.backend if settings.event_dedupe_shared and user_store.backend.shared else None,
+)
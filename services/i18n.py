@@ -1,5 +1,9 @@
 """Internationalization support for multi-language messages."""
 
+import re
+
+CHINESE_PATTERN = re.compile(r"[\u4e00-\u9fff]")
+
 MESSAGES = {
     "zh": {
         "empty_input": "请输入您想要访问的网址，例如：`google.com 请给我代理地址`",
@@ -41,6 +45,26 @@ MESSAGES = {
         "delkey_success": "✅ API Key 已删除。",
         "delkey_none": "您没有配置 API Key。",
         "invalid_api_key": "❌ 您的 API Key 已失效，请使用 `/setkey <new_api_key>` 重新配置。",
+        # Rate limiting
+        "rate_limited": "⏳ 请求过于频繁，请稍后再试。",
+        "rate_limited_qurls": "⏳ 本次请求包含 {count} 个网址，超出了您的 API Key 当前的生成额度。请减少网址数量或稍后再试。",
+        "busy": "⏳ 机器人当前繁忙，请稍后再试。",
+        "pending_header": "\n\n⏳ *正在生成代理链接:*",
+        "pending_item": "• {url}",
+        # Admin commands
+        "admin_only": "⛔ 只有管理员可以使用此命令。",
+        "reload_aliases_success": "✅ 已重新加载 {count} 个域名别名（版本 `{version}`）。",
+        "reload_aliases_unchanged": "域名别名没有变化（版本 `{version}`）。",
+        "reload_aliases_error": "❌ 重新加载域名别名失败，继续使用当前版本: {error}",
+        "profile_usage": "用法: `/profile <秒数>`（最多 {max_seconds} 秒）",
+        "profile_started": "🔍 开始采样事件循环 {seconds} 秒…",
+        "profile_busy": "已有一个性能分析正在运行，请稍后再试。",
+        "profile_done": (
+            "✅ 性能分析完成: {samples} 个样本，{busy} 个忙碌，{stalled} 个阻塞。\n"
+            "事件循环最大延迟 {max_lag}ms，p99 {p99_lag}ms。\n"
+            "调用栈已写入 `{path}`\n"
+            "最耗时的帧:\n{top_frames}"
+        ),
     },
     "en": {
         "empty_input": "Please enter the URL you want to access, e.g.: `google.com I need a proxy`",
@@ -82,6 +106,26 @@ MESSAGES = {
         "delkey_success": "✅ API Key deleted.",
         "delkey_none": "You don't have an API Key configured.",
         "invalid_api_key": "❌ Your API Key is invalid or expired. Please use `/setkey <new_api_key>` to reconfigure.",
+        # Rate limiting
+        "rate_limited": "⏳ You're sending requests too quickly. Please try again in a moment.",
+        "rate_limited_qurls": "⏳ This request has {count} URLs, which exceeds your API Key's current rate limit. Please send fewer URLs or try again later.",
+        "busy": "⏳ The bot is busy right now. Please try again in a moment.",
+        "pending_header": "\n\n⏳ *Generating proxy links:*",
+        "pending_item": "• {url}",
+        # Admin commands
+        "admin_only": "⛔ Only admins can use this command.",
+        "reload_aliases_success": "✅ Reloaded {count} domain aliases (version `{version}`).",
+        "reload_aliases_unchanged": "Domain aliases are unchanged (version `{version}`).",
+        "reload_aliases_error": "❌ Failed to reload domain aliases, keeping the current version: {error}",
+        "profile_usage": "Usage: `/profile <seconds>` (up to {max_seconds} seconds)",
+        "profile_started": "🔍 Sampling the event loop for {seconds} seconds…",
+        "profile_busy": "A profile is already running. Please try again later.",
+        "profile_done": (
+            "✅ Profile finished: {samples} samples, {busy} busy, {stalled} stalled.\n"
+            "Max event loop lag {max_lag}ms, p99 {p99_lag}ms.\n"
+            "Stacks written to `{path}`\n"
+            "Hottest frames:\n{top_frames}"
+        ),
     },
 }
 
@@ -111,6 +155,11 @@ def normalize_language(lang: str) -> str:
     return "en"
 
 
+def detect_language(text: str) -> str:
+    """Return "zh" if the text contains Chinese characters, otherwise "en"."""
+    return "zh" if CHINESE_PATTERN.search(text) else "en"
+
+
 def get_message(key: str, lang: str = "en", **kwargs) -> str:
     """
     Get a localized message.
@@ -0,0 +1,158 @@
+"""Rule-based fast path for analyzing obvious requests without calling Claude."""
+
+import logging
+import re
+
+from services.ai_analyzer import AnalysisResult
+from services.domain_resolver import domain_resolver
+from services.i18n import detect_language
+from services.url_parser import extract_urls, strip_urls
+
+logger = logging.getLogger(__name__)
+
+# Latin words (also matches words glued to CJK text)
+WORD_PATTERN = re.compile(r"[A-Za-z0-9][A-Za-z0-9_-]*")
+
+PROXY_KEYWORDS_EN = {"qurl", "qurls", "proxy", "vpn", "link", "access"}
+PROXY_KEYWORDS_ZH = ("代理", "链接", "访问", "翻墙", "科学上网")
+
+# Words that carry no information beyond the URL, keyword and duration
+FILLER_WORDS_EN = {
+    "a", "an", "the", "for", "of", "to", "me", "my", "i", "please", "pls", "plz",
+    "give", "get", "need", "want", "generate", "create", "make", "can", "could",
+    "you", "with", "valid", "expires", "expiring", "expire", "in", "help", "and",
+    "on", "url", "urls", "links", "new", "one", "some", "would", "like",
+}
+FILLER_WORDS_ZH = (
+    "请", "帮我", "给我", "帮忙", "生成", "一个", "个", "的", "要", "想要", "想",
+    "需要", "创建", "有效期", "为", "我", "下", "吧", "谢谢",
+)
+
+DURATION_UNITS_EN = {
+    "m": "m", "min": "m", "mins": "m", "minute": "m", "minutes": "m",
+    "h": "h", "hr": "h", "hrs": "h", "hour": "h", "hours": "h",
+    "d": "d", "day": "d", "days": "d",
+    "w": "w", "wk": "w", "wks": "w", "week": "w", "weeks": "w",
+}
+DURATION_UNITS_ZH = {"分钟": "m", "小时": "h", "天": "d", "日": "d", "周": "w", "星期": "w"}
+CHINESE_NUMERALS = {
+    "一": 1, "两": 2, "二": 2, "三": 3, "四": 4, "五": 5,
+    "六": 6, "七": 7, "八": 8, "九": 9, "十": 10,
+}
+
+DURATION_PATTERN_EN = re.compile(
+    r"\b(\d+)\s*(" + "|".join(sorted(DURATION_UNITS_EN, key=len, reverse=True)) + r")\b",
+    re.IGNORECASE,
+)
+DURATION_PATTERN_ZH = re.compile(
+    r"(\d+|[一两二三四五六七八九十])\s*(?:个)?\s*(" + "|".join(DURATION_UNITS_ZH) + r")"
+)
+
+PUNCTUATION_PATTERN = re.compile(r"[\s,.!?;:，。！？；：、()（）\"'`~\-]+")
+
+
+def _format_duration(amount: int, unit: str) -> str | None:
+    """Format a duration in the API's expires_in syntax (weeks become days)."""
+    if amount <= 0:
+        return None
+    if unit == "w":
+        return f"{amount * 7}d"
+    return f"{amount}{unit}"
+
+
+def parse_duration(text: str) -> tuple[str | None, str]:
+    """
+    Find a validity period in the text.
+
+    Args:
+        text: Message text
+
+    Returns:
+        Tuple of (expires_in or None, text with the duration removed)
+    """
+    match = DURATION_PATTERN_EN.search(text)
+    if match:
+        unit = DURATION_UNITS_EN[match.group(2).lower()]
+        expires_in = _format_duration(int(match.group(1)), unit)
+        return expires_in, text[:match.start()] + " " + text[match.end():]
+
+    match = DURATION_PATTERN_ZH.search(text)
+    if match:
+        raw = match.group(1)
+        amount = int(raw) if raw.isdigit() else CHINESE_NUMERALS[raw]
+        expires_in = _format_duration(amount, DURATION_UNITS_ZH[match.group(2)])
+        return expires_in, text[:match.start()] + " " + text[match.end():]
+
+    return None, text
+
+
+class IntentParser:
+    """Deterministic analyzer for messages that name URLs/aliases explicitly."""
+
+    def parse(self, text: str) -> AnalysisResult | None:
+        """
+        Analyze a message without calling Claude.
+
+        Only returns a result when every part of the message is accounted for
+        (URLs, aliases, proxy keywords, a duration and filler words). Anything
+        else is left to the LLM.
+
+        Args:
+            text: Preprocessed user message text
+
+        Returns:
+            AnalysisResult if the message is unambiguous, None otherwise
+        """
+        if not text or not text.strip():
+            return None
+
+        urls = list(dict.fromkeys(extract_urls(text)))
+        remaining = strip_urls(text).casefold()
+
+        # Cut out aliases (including multi-word and CJK ones) found in one pass
+        pieces = []
+        last_end = 0
+        for start, end, url in domain_resolver.find_matches(remaining):
+            if url not in urls:
+                urls.append(url)
+            pieces.append(remaining[last_end:start])
+            last_end = end
+        pieces.append(remaining[last_end:])
+        remaining = " ".join(pieces)
+
+        expires_in, remaining = parse_duration(remaining)
+
+        wants_proxy = False
+        for keyword in PROXY_KEYWORDS_ZH:
+            if keyword in remaining:
+                wants_proxy = True
+                remaining = remaining.replace(keyword, " ")
+        for filler in FILLER_WORDS_ZH:
+            remaining = remaining.replace(filler, " ")
+
+        leftover = []
+        for word in WORD_PATTERN.findall(remaining):
+            if word in PROXY_KEYWORDS_EN:
+                wants_proxy = True
+            elif word not in FILLER_WORDS_EN:
+                leftover.append(word)
+        remaining = WORD_PATTERN.sub(" ", remaining)
+
+        if leftover or PUNCTUATION_PATTERN.sub("", remaining):
+            # Unrecognized words (website names, questions, ...) need Claude
+            return None
+        if not urls:
+            return None
+
+        logger.debug(f"Fast-path analysis matched: urls={urls}, expires_in={expires_in}")
+        return AnalysisResult(
+            language=detect_language(text),
+            urls=urls,
+            wants_proxy=wants_proxy,
+            expires_in=expires_in,
+            reason=None,
+        )
+
+
+# Singleton instance
+intent_parser = IntentParser()
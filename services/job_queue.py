@@ -0,0 +1,168 @@
+"""Bounded priority queue and worker pool for message processing."""
+
+import asyncio
+import logging
+import time
+from collections import deque
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass, field
+from enum import IntEnum
+
+from config import settings
+from services.metrics import errors_total, job_seconds, job_wait_seconds
+
+logger = logging.getLogger(__name__)
+
+
+class Priority(IntEnum):
+    """Job priorities, lower values run first."""
+
+    COMMAND = 0
+    DIRECT_MESSAGE = 1
+    MENTION = 2
+
+
+@dataclass
+class Job:
+    priority: Priority
+    run: Callable[[], Awaitable[None]]
+    # Called (and awaited) if the job is dropped to make room for a more important one
+    on_shed: Callable[[], Awaitable[None]] | None = None
+    queued_at: float = field(default_factory=time.perf_counter)
+
+
+class JobQueue:
+    """
+    Run queued jobs on a fixed pool of workers, highest priority first.
+
+    The queue holds at most `max_depth` jobs. When it is full, a new job
+    displaces the newest queued job of a lower priority, or is rejected if
+    there is none.
+    """
+
+    def __init__(self, workers: int, max_depth: int):
+        self.worker_count = max(1, workers)
+        self.max_depth = max_depth
+        self._queues: dict[Priority, deque[Job]] = {priority: deque() for priority in Priority}
+        self._has_work = asyncio.Event()
+        self._idle = asyncio.Event()
+        self._idle.set()
+        self._workers: list[asyncio.Task] = []
+        self._notifications: set[asyncio.Task] = set()
+        self._accepting = True
+        self.active = 0
+        self.shed_count = 0
+
+    @property
+    def depth(self) -> int:
+        """Number of jobs waiting for a worker."""
+        return sum(len(queue) for queue in self._queues.values())
+
+    def start(self):
+        """Start the worker pool."""
+        if not self._workers:
+            self._accepting = True
+            self._workers = [asyncio.create_task(self._worker()) for _ in range(self.worker_count)]
+            logger.info(f"Started {self.worker_count} message workers")
+
+    def submit(
+        self,
+        priority: Priority,
+        run: Callable[[], Awaitable[None]],
+        on_shed: Callable[[], Awaitable[None]] | None = None,
+    ) -> bool:
+        """
+        Queue a job without waiting for it.
+
+        Args:
+            priority: Job priority
+            run: Zero-argument coroutine function doing the work
+            on_shed: Coroutine function to call if the job is later displaced
+
+        Returns:
+            False if the job was rejected because the queue is full or draining
+        """
+        if not self._accepting:
+            return False
+
+        if self.depth >= self.max_depth and not self._displace(priority):
+            self.shed_count += 1
+            logger.warning(f"Job queue full ({self.depth} queued), shedding {priority.name} job")
+            return False
+
+        self._queues[priority].append(Job(priority, run, on_shed))
+        self._idle.clear()
+        self._has_work.set()
+        return True
+
+    def _displace(self, priority: Priority) -> bool:
+        """Drop the newest queued job of the lowest priority below `priority`."""
+        for lower in sorted(Priority, reverse=True):
+            if lower <= priority:
+                return False
+            if self._queues[lower]:
+                job = self._queues[lower].pop()
+                self.shed_count += 1
+                logger.warning(f"Job queue full, displacing a {lower.name} job for a {priority.name} job")
+                if job.on_shed is not None:
+                    task = asyncio.create_task(self._run_safely(job.on_shed))
+                    self._notifications.add(task)
+                    task.add_done_callback(self._notifications.discard)
+                return True
+        return False
+
+    def _pop(self) -> Job | None:
+        for priority in Priority:
+            if self._queues[priority]:
+                return self._queues[priority].popleft()
+        return None
+
+    async def _worker(self):
+        while True:
+            job = self._pop()
+            if job is None:
+                self._has_work.clear()
+                await self._has_work.wait()
+                continue
+            self.active += 1
+            priority = job.priority.name.lower()
+            job_wait_seconds.labels(priority=priority).observe(time.perf_counter() - job.queued_at)
+            try:
+                with job_seconds.labels(priority=priority).time():
+                    await self._run_safely(job.run)
+            finally:
+                self.active -= 1
+                if self.active == 0 and self.depth == 0:
+                    self._idle.set()
+
+    @staticmethod
+    async def _run_safely(func: Callable[[], Awaitable[None]]):
+        try:
+            await func()
+        except Exception as e:
+            errors_total.labels(stage="job", type=type(e).__name__).inc()
+            logger.error(f"Job failed: {e}")
+
+    async def drain(self, timeout: float):
+        """
+        Stop accepting jobs, let queued and running jobs finish, then stop the workers.
+
+        Args:
+            timeout: Seconds to wait before cancelling whatever is left
+        """
+        self._accepting = False
+        try:
+            await asyncio.wait_for(self._idle.wait(), timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"Job queue drain timed out with {self.depth} queued and {self.active} running jobs")
+
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        for queue in self._queues.values():
+            queue.clear()
+
+
+# Singleton instance
+job_queue = JobQueue(workers=settings.job_workers, max_depth=settings.job_queue_max_depth)
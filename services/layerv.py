@@ -1,8 +1,16 @@
+import asyncio
 import httpx
 import logging
-from dataclasses import dataclass
+from collections.abc import Callable
+from dataclasses import astuple, dataclass
+from hashlib import sha256
 
 from config import settings
+from services.concurrency import ConcurrencyLimiter
+from services.metrics import invalid_api_keys_total, stage_seconds
+from services.resilience import call_with_resilience, get_breaker, parse_retry_after
+from services.singleflight import SingleFlight
+from services.tracing import SPAN_KIND_CLIENT, tracer
 
 logger = logging.getLogger(__name__)
 
@@ -17,6 +25,15 @@ class InvalidApiKeyError(Exception):
     pass
 
 
+class LayerVApiError(Exception):
+    """Raised when the LayerV API returns an error response."""
+
+    def __init__(self, message: str, status_code: int, retry_after: float | None = None):
+        super().__init__(message)
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+
 @dataclass
 class QURLResponse:
     resource_id: str
@@ -25,11 +42,89 @@ class QURLResponse:
     expires_at: str
 
 
+@dataclass
+class QURLRequest:
+    target_url: str
+    expires_in: str | None = None
+    description: str | None = None
+    one_time_use: bool = True
+
+
+# Status codes meaning the batch endpoint is not available on this server
+BATCH_UNSUPPORTED_STATUSES = {404, 405, 501}
+
+# Responses worth retrying for idempotent requests
+RETRYABLE_STATUSES = {429, 502, 503, 504}
+
+# Responses that mean the request was rejected before it was processed, so
+# QURL creation can be retried without minting duplicates. A 502/504 may come
+# from a gateway that already forwarded the request.
+RETRYABLE_STATUSES_NON_IDEMPOTENT = {429, 503}
+
+# Transport errors raised before the request reached the server
+CONNECT_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)
+
+# Progress callback of create_qurls: (request index, result)
+ResultCallback = Callable[[int, "QURLResponse | Exception"], None]
+
+
 class LayerVClient:
     """Client for LayerV QURL API."""
 
     def __init__(self):
         self.api_url = settings.layerv_api_url
+        self._client: httpx.AsyncClient | None = None
+        self.http2 = settings.layerv_http2
+        # None until the first bulk call tells us whether /v1/qurl/batch exists
+        self.batch_supported: bool | None = None
+        # Caps the pipelined fallback of create_qurls, globally and per owner
+        self.limiter = ConcurrencyLimiter(
+            global_limit=settings.qurl_max_concurrency,
+            per_key_limit=settings.qurl_max_concurrency_per_user,
+        )
+        self.breaker = get_breaker("layerv")
+        # Identical concurrent requests with the same API key share one API call
+        self._in_flight = SingleFlight("create_qurl")
+
+    def _build_client(self) -> httpx.AsyncClient:
+        """Create the shared connection-pooling HTTP client."""
+        if self.http2:
+            try:
+                import h2  # noqa: F401
+            except ImportError:
+                logger.warning("LAYERV_HTTP2 is enabled but the 'h2' package is not installed, using HTTP/1.1")
+                self.http2 = False
+
+        return httpx.AsyncClient(
+            http2=self.http2,
+            limits=httpx.Limits(
+                max_connections=settings.layerv_max_connections,
+                max_keepalive_connections=settings.layerv_max_keepalive_connections,
+                keepalive_expiry=settings.layerv_keepalive_expiry,
+            ),
+            timeout=httpx.Timeout(
+                settings.layerv_timeout,
+                connect=settings.layerv_connect_timeout,
+            ),
+        )
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        """Shared HTTP client, created on first use."""
+        if self._client is None or self._client.is_closed:
+            self._client = self._build_client()
+        return self._client
+
+    async def start(self):
+        """Open the shared HTTP client."""
+        _ = self.client
+        logger.info(f"LayerV client started (http2={self.http2})")
+
+    async def aclose(self):
+        """Close the shared HTTP client and its pooled connections."""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
 
     async def verify_api_key(self, api_key: str) -> bool:
         """
@@ -42,16 +137,15 @@ class LayerVClient:
             True if valid, False otherwise
         """
         try:
-            async with httpx.AsyncClient() as client:
-                # Try to get quota info to verify the key
-                response = await client.get(
-                    f"{self.api_url}/v1/quota",
-                    headers={
-                        "Authorization": f"Bearer {api_key}",
-                    },
-                    timeout=10.0,
-                )
-                return response.status_code == 200
+            # Try to get quota info to verify the key
+            response = await self._request(
+                "GET",
+                "/v1/quota",
+                api_key,
+                idempotent=True,
+                timeout=10.0,
+            )
+            return response.status_code == 200
         except Exception as e:
             logger.error(f"Failed to verify API key: {e}")
             return False
@@ -79,49 +173,327 @@ class LayerVClient:
 
         Raises:
             InvalidApiKeyError: If the API key is invalid
-            Exception: For other API errors
+            LayerVApiError: For other API errors
+            CircuitOpenError: If LayerV is currently considered unhealthy
         """
-        payload = {
-            "target_url": target_url,
-            "expires_in": expires_in or settings.qurl_default_expires_in,
-            "one_time_use": one_time_use,
-        }
-        if description:
-            payload["description"] = description
+        request = QURLRequest(
+            target_url=target_url,
+            expires_in=expires_in or settings.qurl_default_expires_in,
+            description=description,
+            one_time_use=one_time_use,
+        )
+        return await self._in_flight.do(
+            (self._key_digest(api_key), astuple(request)),
+            lambda: self._create_qurl(api_key, request),
+        )
+
+    async def _create_qurl(self, api_key: str, request: QURLRequest) -> QURLResponse:
+        """Send one POST /v1/qurl request."""
+        target_url = request.target_url
+        payload = self._build_payload(request)
 
         logger.info(f"Creating QURL with api_key: {api_key[:12]}..., target_url: {target_url}")
         logger.info(f"Payload: {payload}")
 
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                f"{self.api_url}/v1/qurl",
-                json=payload,
-                headers={
-                    "Authorization": f"Bearer {api_key}",
-                    "Content-Type": "application/json",
-                },
-                timeout=30.0,
+        with (
+            stage_seconds.labels(stage="create_qurl").time(),
+            tracer.span("layerv.create_qurl", kind=SPAN_KIND_CLIENT, target_url=target_url) as span,
+        ):
+            response = await self._request("POST", "/v1/qurl", api_key, json=payload)
+            if span is not None:
+                span.set_attribute("http.status_code", response.status_code)
+
+        logger.info(f"QURL API response status: {response.status_code}, body: {response.text[:200]}")
+        if response.status_code == 201:
+            return self._parse_qurl(response.json()["data"])
+        self._raise_for_error(response)
+
+    def reports_progress(self, count: int) -> bool:
+        """
+        Whether create_qurls for `count` requests reports results gradually.
+
+        Pipelined calls report every item as it finishes; the batch endpoint
+        reports once per chunk, so a single chunk arrives all at once.
+        """
+        return self.batch_supported is False or count > max(1, settings.layerv_batch_size)
+
+    async def create_qurls(
+        self,
+        api_key: str,
+        requests: list[QURLRequest],
+        owner: str | None = None,
+        on_result: ResultCallback | None = None,
+        coalesce: bool = True,
+    ) -> list[QURLResponse | Exception]:
+        """
+        Create QURLs for many targets at once.
+
+        Uses the batch endpoint when the server supports it, otherwise falls
+        back to concurrent create_qurl calls over the pooled connection.
+
+        Args:
+            api_key: User's LayerV API key
+            requests: Targets with per-item expiry and description
+            owner: Key for per-owner concurrency limits (e.g. Slack user ID)
+            on_result: Called with (index, result) as soon as each item is done
+            coalesce: Share identical concurrent calls. Pass False when every
+                request must mint its own QURL (e.g. several links for one target)
+
+        Returns:
+            One QURLResponse or Exception per request, in request order
+
+        Raises:
+            InvalidApiKeyError: If the API key is invalid (aborts the whole call)
+        """
+        if not requests:
+            return []
+        if not coalesce:
+            with tracer.span("layerv.create_qurls", items=len(requests)):
+                return await self._create_qurls(api_key, requests, owner, on_result, coalesce=False)
+
+        started = False
+
+        def run():
+            nonlocal started
+            started = True
+            return self._create_qurls(api_key, requests, owner, on_result)
+
+        key = (self._key_digest(api_key), owner, tuple(astuple(r) for r in requests))
+        with tracer.span("layerv.create_qurls", items=len(requests)):
+            results = await self._in_flight.do(key, run)
+        if on_result is not None and not started:
+            # Joined a call started by someone else, report everything at once
+            for i, result in enumerate(results):
+                on_result(i, result)
+        # Callers sharing the call each get their own list
+        return list(results)
+
+    async def _create_qurls(
+        self,
+        api_key: str,
+        requests: list[QURLRequest],
+        owner: str | None,
+        on_result: ResultCallback | None = None,
+        coalesce: bool = True,
+    ) -> list[QURLResponse | Exception]:
+        if self.batch_supported is not False:
+            results = []
+            batch_size = max(1, settings.layerv_batch_size)
+            for start in range(0, len(requests), batch_size):
+                chunk = requests[start:start + batch_size]
+                try:
+                    chunk_results = await self._create_batch(api_key, chunk)
+                except InvalidApiKeyError:
+                    raise
+                except Exception as e:
+                    logger.error(f"QURL batch request failed: {e}")
+                    chunk_results = [e] * len(chunk)
+                if chunk_results is None:
+                    # Server has no batch endpoint, do the rest one by one
+                    results.extend(
+                        await self._create_pipelined(
+                            api_key, requests[start:], owner or api_key, on_result, offset=start, coalesce=coalesce
+                        )
+                    )
+                    return results
+                if on_result is not None:
+                    for i, result in enumerate(chunk_results, start=start):
+                        on_result(i, result)
+                results.extend(chunk_results)
+            return results
+
+        return await self._create_pipelined(api_key, requests, owner or api_key, on_result, coalesce=coalesce)
+
+    async def _create_batch(
+        self, api_key: str, requests: list[QURLRequest]
+    ) -> list[QURLResponse | Exception] | None:
+        """
+        Create QURLs through POST /v1/qurl/batch.
+
+        Returns:
+            Per-item results, or None if the server has no batch endpoint
+        """
+        logger.info(f"Creating {len(requests)} QURLs in batch with api_key: {api_key[:12]}...")
+        with (
+            stage_seconds.labels(stage="create_qurl_batch").time(),
+            tracer.span("layerv.create_qurl_batch", kind=SPAN_KIND_CLIENT, items=len(requests)) as span,
+        ):
+            response = await self._request(
+                "POST",
+                "/v1/qurl/batch",
+                api_key,
+                json={"items": [self._build_payload(r) for r in requests]},
             )
+            if span is not None:
+                span.set_attribute("http.status_code", response.status_code)
 
-            logger.info(f"QURL API response status: {response.status_code}, body: {response.text[:200]}")
-            if response.status_code == 201:
-                data = response.json()["data"]
-                return QURLResponse(
-                    resource_id=data["resource_id"],
-                    qurl_link=data["qurl_link"],
-                    qurl_site=data["qurl_site"],
-                    expires_at=data["expires_at"],
-                )
-            elif response.status_code == 401:
-                logger.error(f"API key invalid, response: {response.text}")
-                raise InvalidApiKeyError("Invalid or expired API key")
+        if response.status_code in BATCH_UNSUPPORTED_STATUSES:
+            if self.batch_supported is None:
+                logger.info("LayerV batch endpoint not available, using pipelined requests")
+            self.batch_supported = False
+            return None
+        if response.status_code not in (200, 201, 207):
+            self._raise_for_error(response)
+
+        self.batch_supported = True
+        items = response.json().get("data", [])
+        results: list[QURLResponse | Exception] = []
+        for i in range(len(requests)):
+            item = items[i] if i < len(items) else None
+            if not item:
+                results.append(Exception("Failed to create QURL: missing batch result"))
+            elif "error" in item:
+                detail = (item.get("error") or {}).get("detail", "Unknown error")
+                results.append(Exception(f"Failed to create QURL: {detail}"))
             else:
-                logger.error(f"QURL API error: {response.status_code} - {response.text}")
-                error_data = response.json()
-                error_detail = error_data.get("error", {}).get(
-                    "detail", "Unknown error"
-                )
-                raise Exception(f"Failed to create QURL: {error_detail}")
+                results.append(self._parse_qurl(item))
+        return results
+
+    async def _create_pipelined(
+        self,
+        api_key: str,
+        requests: list[QURLRequest],
+        owner: str,
+        on_result: ResultCallback | None = None,
+        offset: int = 0,
+        coalesce: bool = True,
+    ) -> list[QURLResponse | Exception]:
+        """
+        Run create_qurl concurrently for each request under the concurrency limits.
+
+        With `coalesce=False` identical requests are sent separately instead of
+        sharing one in-flight call, so each gets its own QURL.
+        """
+
+        async def create(index: int, request: QURLRequest) -> QURLResponse | Exception:
+            try:
+                async with self.limiter.slot(owner):
+                    if coalesce:
+                        result = await self.create_qurl(
+                            api_key=api_key,
+                            target_url=request.target_url,
+                            expires_in=request.expires_in,
+                            description=request.description,
+                            one_time_use=request.one_time_use,
+                        )
+                    else:
+                        result = await self._create_qurl(api_key, request)
+            except InvalidApiKeyError:
+                raise
+            except Exception as e:
+                result = e
+            if on_result is not None:
+                on_result(index, result)
+            return result
+
+        tasks = [asyncio.ensure_future(create(i, r)) for i, r in enumerate(requests, start=offset)]
+        try:
+            return list(await asyncio.gather(*tasks))
+        except InvalidApiKeyError:
+            for task in tasks:
+                task.cancel()
+            raise
+
+    async def _request(
+        self,
+        method: str,
+        path: str,
+        api_key: str,
+        idempotent: bool = False,
+        **kwargs,
+    ) -> httpx.Response:
+        """
+        Send a request through the retry policy and the LayerV circuit breaker.
+
+        Non-idempotent requests are only retried when the server cannot have
+        processed them (connection failures, 429 and 503). 502 and 504 still
+        count as failures for the circuit breaker.
+
+        Raises:
+            CircuitOpenError: If LayerV is currently considered unhealthy
+            LayerVApiError: For 429/5xx responses once retries are exhausted
+        """
+
+        async def attempt() -> httpx.Response:
+            response = await self.client.request(
+                method, f"{self.api_url}{path}", headers=self._headers(api_key), **kwargs
+            )
+            if response.status_code == 429 or (
+                response.status_code >= 500 and response.status_code not in BATCH_UNSUPPORTED_STATUSES
+            ):
+                self._raise_for_error(response)
+            return response
+
+        def is_retryable(e: Exception) -> bool:
+            if isinstance(e, LayerVApiError):
+                statuses = RETRYABLE_STATUSES if idempotent else RETRYABLE_STATUSES_NON_IDEMPOTENT
+                return e.status_code in statuses
+            if idempotent:
+                return isinstance(e, httpx.TransportError)
+            return isinstance(e, CONNECT_ERRORS)
+
+        def is_failure(e: Exception) -> bool:
+            if isinstance(e, LayerVApiError):
+                return e.status_code >= 500
+            return isinstance(e, httpx.TransportError)
+
+        return await call_with_resilience(
+            attempt,
+            self.breaker,
+            is_retryable=is_retryable,
+            is_failure=is_failure,
+            get_retry_after=lambda e: getattr(e, "retry_after", None),
+        )
+
+    @staticmethod
+    def _key_digest(api_key: str) -> str:
+        return sha256(api_key.encode()).hexdigest()
+
+    @staticmethod
+    def _headers(api_key: str) -> dict:
+        return {
+            "Authorization": f"Bearer {api_key}",
+            "Content-Type": "application/json",
+        }
+
+    @staticmethod
+    def _build_payload(request: QURLRequest) -> dict:
+        payload = {
+            "target_url": request.target_url,
+            "expires_in": request.expires_in or settings.qurl_default_expires_in,
+            "one_time_use": request.one_time_use,
+        }
+        if request.description:
+            payload["description"] = request.description
+        return payload
+
+    @staticmethod
+    def _parse_qurl(data: dict) -> QURLResponse:
+        return QURLResponse(
+            resource_id=data["resource_id"],
+            qurl_link=data["qurl_link"],
+            qurl_site=data["qurl_site"],
+            expires_at=data["expires_at"],
+        )
+
+    @staticmethod
+    def _raise_for_error(response: httpx.Response):
+        """Raise the appropriate exception for a failed API response."""
+        if response.status_code == 401:
+            invalid_api_keys_total.inc()
+            logger.error(f"API key invalid, response: {response.text}")
+            raise InvalidApiKeyError("Invalid or expired API key")
+
+        logger.error(f"QURL API error: {response.status_code} - {response.text}")
+        try:
+            error_detail = response.json().get("error", {}).get("detail", "Unknown error")
+        except ValueError:
+            error_detail = f"HTTP {response.status_code}"
+        raise LayerVApiError(
+            f"Failed to create QURL: {error_detail}",
+            status_code=response.status_code,
+            retry_after=parse_retry_after(response.headers.get("Retry-After")),
+        )
 
 
 # Singleton instance
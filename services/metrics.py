@@ -0,0 +1,304 @@
+"""Prometheus metrics: counters, histograms and a /metrics endpoint."""
+
+import logging
+import math
+import time
+from abc import ABC, abstractmethod
+from bisect import bisect_left
+from collections.abc import Callable, Iterable
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+# Prometheus client defaults, plus 30s for slow upstream calls
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.075, 0.1, 0.25, 0.5, 0.75, 1.0, 2.5, 5.0, 7.5, 10.0, 30.0)
+
+# (metric name, type, help, samples). Samples are (labels, value), or
+# (labels, value, name suffix) for histogram _bucket/_sum/_count series.
+MetricFamily = tuple[str, str, str, list[tuple]]
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    if math.isnan(value):
+        return "NaN"
+    value = float(value)
+    return str(int(value)) if value.is_integer() else repr(value)
+
+
+def _escape_label_value(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labels: dict[str, str]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape_label_value(str(value))}"' for key, value in labels.items()) + "}"
+
+
+class _Metric(ABC):
+    """Base for labelled metrics; children are created on first use."""
+
+    type = ""
+
+    def __init__(self, name: str, help: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._children: dict[tuple[str, ...], object] = {}
+        if not self.labelnames:
+            self._children[()] = self._new_child()
+
+    @abstractmethod
+    def _new_child(self):
+        """Create the value holder for one label combination."""
+
+    def labels(self, **labels: str):
+        """Get the child metric for one combination of label values."""
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        child = self._children.get(key)
+        if child is None:
+            child = self._children[key] = self._new_child()
+        return child
+
+    def _unlabelled(self):
+        return self._children[()]
+
+    @abstractmethod
+    def collect(self) -> MetricFamily:
+        """Return the metric family with one sample per child."""
+
+
+class _Value:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0.0
+
+    def inc(self, amount: float = 1.0):
+        self.value += amount
+
+
+class Counter(_Metric):
+    """Monotonically increasing count."""
+
+    type = "counter"
+
+    def _new_child(self):
+        return _Value()
+
+    def inc(self, amount: float = 1.0):
+        self._unlabelled().inc(amount)
+
+    def collect(self) -> MetricFamily:
+        samples = [
+            (dict(zip(self.labelnames, key)), child.value)
+            for key, child in self._children.items()
+        ]
+        return (self.name, self.type, self.help, samples)
+
+
+class _HistogramChild:
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets: tuple[float, ...]):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        index = bisect_left(self.buckets, value)
+        if index < len(self.counts):
+            self.counts[index] += 1
+        self.sum += value
+        self.count += 1
+
+    @contextmanager
+    def time(self):
+        """Observe the duration of the block in seconds (also when it raises)."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start)
+
+
+class Histogram(_Metric):
+    """Distribution of observed values in cumulative buckets."""
+
+    type = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labelnames: Iterable[str] = (),
+        buckets: Iterable[float] = DEFAULT_BUCKETS,
+    ):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, help, labelnames)
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value: float):
+        self._unlabelled().observe(value)
+
+    def time(self):
+        return self._unlabelled().time()
+
+    def collect(self) -> MetricFamily:
+        samples = []
+        for key, child in self._children.items():
+            labels = dict(zip(self.labelnames, key))
+            cumulative = 0
+            for bound, count in zip(child.buckets, child.counts):
+                cumulative += count
+                samples.append(({**labels, "le": _format_value(bound)}, cumulative, "_bucket"))
+            samples.append(({**labels, "le": "+Inf"}, child.count, "_bucket"))
+            samples.append((labels, child.sum, "_sum"))
+            samples.append((labels, child.count, "_count"))
+        return (self.name, self.type, self.help, samples)
+
+
+class Registry:
+    """Metrics and scrape-time collectors rendered in the Prometheus text format."""
+
+    def __init__(self):
+        self._metrics: list[_Metric] = []
+        self._collectors: list[Callable[[], Iterable[MetricFamily]]] = []
+
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def add_collector(self, collector: Callable[[], Iterable[MetricFamily]]):
+        """Add a function returning metric families read from existing stats at scrape time."""
+        self._collectors.append(collector)
+
+    def collect(self) -> list[MetricFamily]:
+        families = [metric.collect() for metric in self._metrics]
+        for collector in self._collectors:
+            try:
+                families.extend(collector())
+            except Exception as e:
+                logger.error(f"Metrics collector failed: {e}")
+        return families
+
+    def render(self) -> str:
+        """Render every metric in the Prometheus text exposition format (0.0.4)."""
+        lines = []
+        for name, type_, help_, samples in self.collect():
+            lines.append(f"# HELP {name} {help_}")
+            lines.append(f"# TYPE {name} {type_}")
+            for sample in samples:
+                labels, value = sample[0], sample[1]
+                suffix = sample[2] if len(sample) > 2 else ""
+                lines.append(f"{name}{suffix}{_format_labels(labels)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+# Per-stage latency of process_message
+stage_seconds = registry.register(Histogram(
+    "qurlbot_stage_duration_seconds",
+    "Latency of each message processing stage",
+    ["stage"],
+))
+job_wait_seconds = registry.register(Histogram(
+    "qurlbot_job_wait_seconds",
+    "Time jobs spend queued before a worker picks them up",
+    ["priority"],
+))
+job_seconds = registry.register(Histogram(
+    "qurlbot_job_duration_seconds",
+    "Time spent running a job (a whole message or command)",
+    ["priority"],
+))
+errors_total = registry.register(Counter(
+    "qurlbot_errors_total",
+    "Errors by stage and exception type",
+    ["stage", "type"],
+))
+invalid_api_keys_total = registry.register(Counter(
+    "qurlbot_invalid_api_key_total",
+    "LayerV calls rejected because the user's API key is invalid",
+))
+
+
+def _collect_service_stats() -> list[MetricFamily]:
+    """Read the counters the services already keep."""
+    from services.ai_analyzer import ai_analyzer
+    from services.event_dedupe import event_deduper
+    from services.job_queue import job_queue
+    from services.qurl_pool import qurl_pool
+    from services.rate_limiter import admission_controller
+    from services.resilience import breaker_states
+    from services.user_store import user_store
+
+    analysis = ai_analyzer.cache.stats()
+    keys = user_store.key_cache_stats()
+    pool = qurl_pool.stats()
+    breaker_values = {"closed": 0, "half_open": 1, "open": 2}
+    breakers = breaker_states()
+
+    return [
+        ("qurlbot_cache_requests_total", "counter", "Cache lookups by cache and result", [
+            ({"cache": "analysis", "result": "hit"}, analysis["hits"]),
+            ({"cache": "analysis", "result": "miss"}, analysis["misses"]),
+            ({"cache": "api_key", "result": "hit"}, keys["hits"]),
+            ({"cache": "api_key", "result": "miss"}, keys["misses"]),
+            ({"cache": "qurl_pool", "result": "hit"}, pool["hits"]),
+            ({"cache": "qurl_pool", "result": "miss"}, pool["misses"]),
+        ]),
+        ("qurlbot_cache_entries", "gauge", "Entries currently held by each cache", [
+            ({"cache": "analysis"}, analysis["size"]),
+            ({"cache": "api_key"}, keys["size"]),
+            ({"cache": "qurl_pool"}, pool["links"]),
+        ]),
+        ("qurlbot_job_queue_depth", "gauge", "Jobs waiting for a worker", [({}, job_queue.depth)]),
+        ("qurlbot_job_queue_active", "gauge", "Jobs currently running", [({}, job_queue.active)]),
+        ("qurlbot_shed_total", "counter", "Requests shed by load shedding and rate limits", [
+            ({"reason": "queue_full"}, job_queue.shed_count),
+            ({"reason": "rate_limited"}, admission_controller.shed_count),
+        ]),
+        ("qurlbot_duplicate_events_total", "counter", "Slack event redeliveries dropped", [
+            ({}, event_deduper.duplicates),
+        ]),
+        ("qurlbot_circuit_breaker_state", "gauge", "Circuit state (0 closed, 1 half open, 2 open)", [
+            ({"upstream": name}, breaker_values.get(state["state"], -1)) for name, state in breakers.items()
+        ]),
+        ("qurlbot_circuit_breaker_rejected_total", "counter", "Calls rejected by an open circuit", [
+            ({"upstream": name}, state["total_rejected"]) for name, state in breakers.items()
+        ]),
+    ]
+
+
+registry.add_collector(_collect_service_stats)
+
+
+async def start_metrics_server(host: str, port: int):
+    """
+    Serve GET /metrics on host:port.
+
+    Returns:
+        The aiohttp AppRunner (call `cleanup()` on it to stop the server)
+    """
+    from aiohttp import web
+
+    async def handle_metrics(request: web.Request) -> web.Response:
+        return web.Response(
+            text=registry.render(),
+            headers={"Content-Type": "text/plain; version=0.0.4; charset=utf-8"},
+        )
+
+    metrics_app = web.Application()
+    metrics_app.router.add_get("/metrics", handle_metrics)
+    runner = web.AppRunner(metrics_app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    logger.info(f"Serving metrics on http://{host}:{port}/metrics")
+    return runner
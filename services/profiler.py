@@ -0,0 +1,159 @@
+"""On-demand sampling profiler for diagnosing event-loop stalls."""
+
+import asyncio
+import logging
+import sys
+import threading
+import time
+from collections import Counter
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+PROFILES_DIR = Path(__file__).parent.parent / "data" / "profiles"
+
+# Frames from these files are the loop waiting for I/O, not doing work
+_IDLE_FILES = ("selectors.py", "base_events.py")
+
+
+@dataclass
+class ProfileResult:
+    path: Path
+    seconds: float
+    samples: int
+    busy_samples: int
+    stalled_samples: int
+    max_loop_lag: float
+    p99_loop_lag: float
+    top_frames: list[tuple[str, int]]
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_qualname} ({Path(code.co_filename).name}:{frame.f_lineno})"
+
+
+class SamplingProfiler:
+    """
+    Sample the event-loop thread's stack from a helper thread.
+
+    Every sample is tagged with the asyncio task that was running and with
+    whether the loop was stalled (its heartbeat overdue by more than
+    `stall_threshold` seconds), so blocking calls stand out. Stacks are written
+    in the collapsed format used by flamegraph.pl and speedscope.
+    """
+
+    def __init__(self, output_dir: Path, interval: float = 0.005, stall_threshold: float = 0.1):
+        self.output_dir = output_dir
+        self.interval = interval
+        self.stall_threshold = stall_threshold
+        self._running = False
+        self._heartbeat = 0.0
+
+    @property
+    def running(self) -> bool:
+        return self._running
+
+    async def profile(self, seconds: float) -> ProfileResult:
+        """
+        Profile the running event loop for `seconds`.
+
+        Raises:
+            RuntimeError: If a profile is already running
+        """
+        if self._running:
+            raise RuntimeError("a profile is already running")
+        self._running = True
+        try:
+            return await self._profile(seconds)
+        finally:
+            self._running = False
+
+    async def _profile(self, seconds: float) -> ProfileResult:
+        loop = asyncio.get_running_loop()
+        loop_thread_id = threading.get_ident()
+        stacks: Counter[str] = Counter()
+        self_time: Counter[str] = Counter()
+        counts = {"samples": 0, "busy": 0, "stalled": 0}
+        lags: list[float] = []
+        stop = threading.Event()
+
+        def sample():
+            while not stop.wait(self.interval):
+                frame = sys._current_frames().get(loop_thread_id)
+                if frame is None:
+                    continue
+                frames = []
+                while frame is not None:
+                    frames.append(frame)
+                    frame = frame.f_back
+                counts["samples"] += 1
+
+                top_file = Path(frames[0].f_code.co_filename).name
+                if top_file in _IDLE_FILES and frames[0].f_code.co_name in ("select", "_run_once"):
+                    stacks["[idle]"] += 1
+                    continue
+
+                stalled = time.monotonic() - self._heartbeat > self.stall_threshold
+                task = asyncio.current_task(loop)
+                task_label = f"task:{task.get_coro().__qualname__}" if task else "callback"
+                labels = [_frame_label(f) for f in reversed(frames)]
+                stacks[";".join(["[stalled]" if stalled else "[busy]", task_label, *labels])] += 1
+                self_time[labels[-1]] += 1
+                counts["busy"] += 1
+                counts["stalled"] += stalled
+
+        self._heartbeat = time.monotonic()
+        sampler = threading.Thread(target=sample, name="profiler", daemon=True)
+        sampler.start()
+        logger.info(f"Profiling the event loop for {seconds}s")
+
+        started = time.monotonic()
+        try:
+            while time.monotonic() - started < seconds:
+                expected = time.monotonic() + self.interval
+                await asyncio.sleep(self.interval)
+                now = time.monotonic()
+                lags.append(max(0.0, now - expected))
+                self._heartbeat = now
+        finally:
+            stop.set()
+            await asyncio.to_thread(sampler.join)
+
+        path = await asyncio.to_thread(self._write, stacks)
+        lags.sort()
+        result = ProfileResult(
+            path=path,
+            seconds=seconds,
+            samples=counts["samples"],
+            busy_samples=counts["busy"],
+            stalled_samples=counts["stalled"],
+            max_loop_lag=lags[-1] if lags else 0.0,
+            p99_loop_lag=lags[int(len(lags) * 0.99)] if lags else 0.0,
+            top_frames=self_time.most_common(5),
+        )
+        logger.info(
+            f"Profile written to {path}: {result.samples} samples, {result.stalled_samples} stalled, "
+            f"max loop lag {result.max_loop_lag * 1000:.1f}ms"
+        )
+        return result
+
+    def _write(self, stacks: Counter) -> Path:
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        path = self.output_dir / f"profile-{datetime.now().strftime('%Y%m%d-%H%M%S')}.collapsed"
+        with open(path, "w", encoding="utf-8") as f:
+            for stack, count in stacks.most_common():
+                f.write(f"{stack} {count}\n")
+        return path
+
+
+# Singleton instance
+profiler = SamplingProfiler(
+    PROFILES_DIR,
+    interval=settings.profile_sample_interval,
+    stall_threshold=settings.profile_stall_threshold,
+)
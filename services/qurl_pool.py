@@ -0,0 +1,232 @@
+"""Pool of pre-minted one-time QURLs for frequently requested aliases."""
+
+import asyncio
+import itertools
+import logging
+import time
+from collections import OrderedDict, deque
+from datetime import datetime
+
+from config import settings
+from services.domain_resolver import domain_resolver
+from services.layerv import layerv_client, InvalidApiKeyError, QURLRequest, QURLResponse
+from services.rate_limiter import admission_controller
+from services.url_parser import normalize_and_validate
+from services.user_store import user_store
+
+logger = logging.getLogger(__name__)
+
+
+def _expires_at_timestamp(expires_at: str) -> float | None:
+    """Parse an ISO 8601 expires_at value into a Unix timestamp."""
+    try:
+        parsed = datetime.fromisoformat(expires_at.replace("Z", "+00:00"))
+    except (AttributeError, ValueError):
+        return None
+    if parsed.tzinfo is None:
+        return None
+    return parsed.timestamp()
+
+
+class QURLPool:
+    """
+    Keep a small supply of unused one-time QURLs per user for hot aliases.
+
+    Users are enrolled the first time they ask for a hot alias and dropped
+    after being idle for a while, so links are only minted for people who
+    actually use them. Pooled links use the default expiry; requests with an
+    explicit expiry always mint a fresh link.
+    """
+
+    def __init__(
+        self,
+        aliases: list[str],
+        size: int,
+        min_remaining: float,
+        max_users: int,
+        user_idle: float,
+    ):
+        self.alias_names = aliases
+        self.size = size
+        self.min_remaining = min_remaining
+        self.max_users = max_users
+        self.user_idle = user_idle
+        # user_id -> monotonic time of last use, least recently used first
+        self._users: OrderedDict[str, float] = OrderedDict()
+        # user_id -> enrollment generation; a refill only stores links if it is unchanged
+        self._generations: dict[str, int] = {}
+        self._generation_counter = itertools.count()
+        # (user_id, url) -> deque of (QURLResponse, expiry timestamp)
+        self._links: dict[tuple[str, str], deque[tuple[QURLResponse, float]]] = {}
+        self._refills: dict[str, asyncio.Task] = {}
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.alias_names) and self.size > 0
+
+    def hot_urls(self) -> list[str]:
+        """Normalized target URLs of the pooled aliases in the current catalog."""
+        urls = []
+        for alias in self.alias_names:
+            url = domain_resolver.resolve(alias)
+            normalized = normalize_and_validate(url) if url else None
+            if normalized and normalized not in urls:
+                urls.append(normalized)
+        return urls
+
+    def take(self, user_id: str, url: str) -> QURLResponse | None:
+        """
+        Pop a fresh pooled QURL for a user and (normalized) URL.
+
+        Asking for a hot alias enrolls the user, and every take schedules a
+        background refill.
+
+        Returns:
+            A QURL that has at least `min_remaining` seconds left, or None
+        """
+        if not self.enabled or url not in self.hot_urls():
+            return None
+
+        self._enroll(user_id)
+        links = self._links.get((user_id, url))
+        qurl = None
+        while links:
+            candidate, expires_at = links.popleft()
+            if expires_at - time.time() >= self.min_remaining:
+                qurl = candidate
+                break
+
+        if qurl is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+            logger.info(f"Served pooled QURL for {url} to {user_id}")
+        self.schedule_refill(user_id)
+        return qurl
+
+    def invalidate(self, user_id: str):
+        """Forget a user and every link minted for them (e.g. after the API key changed)."""
+        self._users.pop(user_id, None)
+        self._generations.pop(user_id, None)
+        for key in [key for key in self._links if key[0] == user_id]:
+            del self._links[key]
+
+    def _enroll(self, user_id: str):
+        if user_id not in self._generations:
+            self._generations[user_id] = next(self._generation_counter)
+        self._users[user_id] = time.monotonic()
+        self._users.move_to_end(user_id)
+        while len(self._users) > self.max_users:
+            oldest, _ = self._users.popitem(last=False)
+            self.invalidate(oldest)
+
+    def _prune(self):
+        """Drop idle users and links nearing expiry."""
+        idle_before = time.monotonic() - self.user_idle
+        for user_id in [u for u, last_used in self._users.items() if last_used < idle_before]:
+            logger.info(f"Dropping idle user {user_id} from the QURL pool")
+            self.invalidate(user_id)
+
+        fresh_after = time.time() + self.min_remaining
+        for key, links in list(self._links.items()):
+            fresh = deque(entry for entry in links if entry[1] >= fresh_after)
+            if fresh:
+                self._links[key] = fresh
+            else:
+                del self._links[key]
+
+    def schedule_refill(self, user_id: str):
+        """Start a background refill for a user unless one is already running."""
+        task = self._refills.get(user_id)
+        if task is None or task.done():
+            self._refills[user_id] = asyncio.create_task(self.refill(user_id))
+
+    async def refill(self, user_id: str):
+        """Top up a user's pooled links for every hot alias."""
+        generation = self._generations.get(user_id)
+        if generation is None:
+            return
+        try:
+            description = f"Pre-minted via Slack bot for user {user_id}"
+            requests = []
+            for url in self.hot_urls():
+                missing = self.size - len(self._links.get((user_id, url), ()))
+                requests.extend(QURLRequest(target_url=url, description=description) for _ in range(missing))
+            if not requests:
+                return
+
+            api_key = await user_store.get_api_key(user_id)
+            if not api_key:
+                self.invalidate(user_id)
+                return
+            if not await admission_controller.admit_qurls(api_key, len(requests)):
+                return
+
+            # Every pooled link must be a distinct one-time QURL, so never share a call
+            results = await layerv_client.create_qurls(
+                api_key=api_key, requests=requests, owner=user_id, coalesce=False
+            )
+            if self._generations.get(user_id) != generation:
+                # Invalidated while minting (e.g. the API key changed), the links may use the old key
+                logger.info(f"Discarding QURLs pre-minted for {user_id} before it was invalidated")
+                return
+
+            pooled = {qurl.resource_id for links in self._links.values() for qurl, _ in links}
+            minted = 0
+            for request, result in zip(requests, results):
+                if isinstance(result, Exception):
+                    logger.warning(f"Failed to pre-mint QURL for {request.target_url}: {result}")
+                    continue
+                if result.resource_id in pooled:
+                    logger.warning(f"Discarding duplicate pre-minted QURL {result.resource_id}")
+                    continue
+                pooled.add(result.resource_id)
+                expires_at = _expires_at_timestamp(result.expires_at)
+                if expires_at is None or expires_at - time.time() < self.min_remaining:
+                    continue
+                self._links.setdefault((user_id, request.target_url), deque()).append((result, expires_at))
+                minted += 1
+            logger.info(f"Pre-minted {minted} QURLs for {user_id}")
+        except InvalidApiKeyError:
+            logger.warning(f"Invalid API key for {user_id}, removing from QURL pool")
+            self.invalidate(user_id)
+        except Exception as e:
+            logger.error(f"QURL pool refill failed for {user_id}: {e}")
+        finally:
+            if self._refills.get(user_id) is asyncio.current_task():
+                del self._refills[user_id]
+
+    async def run(self, interval: float):
+        """Periodically discard stale links and top up every enrolled user."""
+        while True:
+            await asyncio.sleep(interval)
+            self._prune()
+            for user_id in list(self._users):
+                self.schedule_refill(user_id)
+
+    async def close(self):
+        """Cancel refills in progress."""
+        tasks = list(self._refills.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def stats(self) -> dict:
+        return {
+            "users": len(self._users),
+            "links": sum(len(links) for links in self._links.values()),
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+# Singleton instance
+qurl_pool = QURLPool(
+    aliases=[a.strip() for a in settings.qurl_pool_aliases.split(",") if a.strip()],
+    size=settings.qurl_pool_size,
+    min_remaining=settings.qurl_pool_min_remaining,
+    max_users=settings.qurl_pool_max_users,
+    user_idle=settings.qurl_pool_user_idle,
+)
@@ -0,0 +1,155 @@
+"""Token-bucket admission control per Slack user, per LayerV API key and globally."""
+
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from hashlib import sha256
+
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class TokenBucket:
+    """Classic token bucket. Tokens may go negative to account for queued callers."""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate  # Tokens per second
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, cost: float) -> float:
+        """Seconds until `cost` tokens are available (inf if it can never fit)."""
+        self._refill(time.monotonic())
+        if cost > self.capacity:
+            return float("inf")
+        deficit = cost - self.tokens
+        return max(0.0, deficit / self.rate)
+
+    def consume(self, cost: float):
+        """Take tokens (call after wait_time)."""
+        self.tokens -= cost
+
+    @property
+    def is_full(self) -> bool:
+        self._refill(time.monotonic())
+        return self.tokens >= self.capacity
+
+
+class KeyedRateLimiter:
+    """One token bucket per key, dropping idle full buckets beyond `max_keys`."""
+
+    def __init__(self, per_minute: float, burst: float, max_keys: int = 10000):
+        self.rate = per_minute / 60.0
+        self.burst = burst
+        self.max_keys = max_keys
+        self._buckets: OrderedDict[str, TokenBucket] = OrderedDict()
+
+    @property
+    def enabled(self) -> bool:
+        return self.rate > 0 and self.burst > 0
+
+    def bucket(self, key: str) -> TokenBucket:
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = TokenBucket(self.rate, self.burst)
+            self._evict()
+        else:
+            self._buckets.move_to_end(key)
+        return bucket
+
+    def _evict(self):
+        while len(self._buckets) > self.max_keys:
+            key, bucket = next(iter(self._buckets.items()))
+            if not bucket.is_full:
+                # Least recently used bucket still has debt, keep it (and stop evicting)
+                break
+            self._buckets.popitem(last=False)
+
+
+def reserve(buckets: list[tuple[TokenBucket, float]], max_wait: float) -> float | None:
+    """
+    Reserve tokens for a request against several buckets at once.
+
+    The request may run once every bucket can serve it within `max_wait`;
+    otherwise it is shed without consuming any tokens.
+
+    Returns:
+        Seconds the request must wait before running, or None if shed
+    """
+    wait = max((bucket.wait_time(cost) for bucket, cost in buckets), default=0.0)
+    if wait > max_wait:
+        return None
+    for bucket, cost in buckets:
+        bucket.consume(cost)
+    return wait
+
+
+async def admit(buckets: list[tuple[TokenBucket, float]], max_wait: float) -> bool:
+    """
+    Admit a request against several buckets at once, waiting (queueing) if needed.
+
+    Returns:
+        True if admitted, False if shed
+    """
+    wait = reserve(buckets, max_wait)
+    if wait is None:
+        return False
+    if wait > 0:
+        await asyncio.sleep(wait)
+    return True
+
+
+class AdmissionController:
+    """Rate limits configured through settings (a rate of 0 disables a limiter)."""
+
+    def __init__(self):
+        self.users = KeyedRateLimiter(settings.rate_limit_user_per_minute, settings.rate_limit_user_burst)
+        self.api_keys = KeyedRateLimiter(
+            settings.rate_limit_api_key_qurls_per_minute, settings.rate_limit_api_key_burst
+        )
+        self.global_limiter = KeyedRateLimiter(
+            settings.rate_limit_global_per_minute, settings.rate_limit_global_burst
+        )
+        self.max_wait = settings.rate_limit_max_wait
+        self.shed_count = 0
+
+    def reserve_message(self, user_id: str) -> float | None:
+        """
+        Admit one message from a Slack user (per-user and global limits).
+
+        Returns:
+            Seconds to delay the message before processing it, or None if shed
+        """
+        buckets = []
+        if self.users.enabled:
+            buckets.append((self.users.bucket(user_id), 1))
+        if self.global_limiter.enabled:
+            buckets.append((self.global_limiter.bucket("*"), 1))
+        wait = reserve(buckets, self.max_wait)
+        if wait is None:
+            self.shed_count += 1
+            logger.warning(f"Rate limit exceeded for user {user_id}, request shed")
+        return wait
+
+    async def admit_qurls(self, api_key: str, count: int) -> bool:
+        """Admit creating `count` QURLs with a LayerV API key."""
+        if not self.api_keys.enabled or count <= 0:
+            return True
+        # Key the bucket on a digest so plaintext API keys aren't kept around
+        key = sha256(api_key.encode()).hexdigest()
+        admitted = await admit([(self.api_keys.bucket(key), count)], self.max_wait)
+        if not admitted:
+            self.shed_count += 1
+            logger.warning(f"QURL rate limit exceeded for API key {api_key[:8]}..., {count} QURLs shed")
+        return admitted
+
+
+# Singleton instance
+admission_controller = AdmissionController()
@@ -0,0 +1,198 @@
+"""Retry with backoff and circuit breakers for upstream API calls."""
+
+import asyncio
+import logging
+import random
+import time
+from collections.abc import Awaitable, Callable
+from typing import TypeVar
+
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class CircuitOpenError(Exception):
+    """Raised when a call is rejected because the upstream's circuit is open."""
+
+    def __init__(self, name: str, retry_in: float):
+        super().__init__(f"{name} is temporarily unavailable, retry in {retry_in:.0f}s")
+        self.name = name
+        self.retry_in = retry_in
+
+
+class CircuitBreaker:
+    """
+    Per-upstream circuit breaker.
+
+    Opens after `failure_threshold` consecutive failures and rejects calls for
+    `reset_timeout` seconds, then lets a single trial call through (half-open).
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, name: str, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self.total_failures = 0
+        self.total_rejected = 0
+        self._trial_in_flight = False
+
+    def before_call(self):
+        """
+        Check whether a call may proceed.
+
+        Raises:
+            CircuitOpenError: If the circuit is open (or half-open with a trial running)
+        """
+        if self.state == self.OPEN:
+            elapsed = time.monotonic() - self.opened_at
+            if elapsed < self.reset_timeout:
+                self.total_rejected += 1
+                raise CircuitOpenError(self.name, self.reset_timeout - elapsed)
+            self._set_state(self.HALF_OPEN)
+
+        if self.state == self.HALF_OPEN:
+            if self._trial_in_flight:
+                self.total_rejected += 1
+                raise CircuitOpenError(self.name, self.reset_timeout)
+            self._trial_in_flight = True
+
+    def record_success(self):
+        """Record a successful call."""
+        self._trial_in_flight = False
+        self.consecutive_failures = 0
+        if self.state != self.CLOSED:
+            self._set_state(self.CLOSED)
+
+    def record_failure(self):
+        """Record a failed call, opening the circuit when the threshold is reached."""
+        self._trial_in_flight = False
+        self.consecutive_failures += 1
+        self.total_failures += 1
+        if self.state == self.HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+            self.opened_at = time.monotonic()
+            if self.state != self.OPEN:
+                self._set_state(self.OPEN)
+
+    def record_neutral(self):
+        """Record a call that says nothing about upstream health (e.g. a 4xx)."""
+        self._trial_in_flight = False
+
+    def _set_state(self, state: str):
+        logger.warning(f"Circuit breaker '{self.name}': {self.state} -> {state}")
+        self.state = state
+
+    def snapshot(self) -> dict:
+        """Return the breaker state for monitoring."""
+        return {
+            "state": self.state,
+            "consecutive_failures": self.consecutive_failures,
+            "total_failures": self.total_failures,
+            "total_rejected": self.total_rejected,
+        }
+
+
+_breakers: dict[str, CircuitBreaker] = {}
+
+
+def get_breaker(name: str) -> CircuitBreaker:
+    """Get (or create) the shared circuit breaker for an upstream."""
+    breaker = _breakers.get(name)
+    if breaker is None:
+        breaker = _breakers[name] = CircuitBreaker(
+            name,
+            failure_threshold=settings.circuit_failure_threshold,
+            reset_timeout=settings.circuit_reset_timeout,
+        )
+    return breaker
+
+
+def breaker_states() -> dict[str, dict]:
+    """Return the state of every circuit breaker, keyed by upstream name."""
+    return {name: breaker.snapshot() for name, breaker in _breakers.items()}
+
+
+def backoff_delay(attempt: int, base_delay: float, max_delay: float) -> float:
+    """Full-jitter exponential backoff for the given (1-based) retry attempt."""
+    return random.uniform(0, min(max_delay, base_delay * (2 ** (attempt - 1))))
+
+
+async def call_with_resilience(
+    func: Callable[[], Awaitable[T]],
+    breaker: CircuitBreaker,
+    is_retryable: Callable[[Exception], bool],
+    is_failure: Callable[[Exception], bool],
+    get_retry_after: Callable[[Exception], float | None] = lambda e: None,
+) -> T:
+    """
+    Call an upstream with retries and a circuit breaker.
+
+    Args:
+        func: Zero-argument coroutine function performing one attempt
+        breaker: Circuit breaker for the upstream
+        is_retryable: Whether an exception may be retried safely
+        is_failure: Whether an exception counts against upstream health
+        get_retry_after: Server-requested delay (e.g. Retry-After) for an exception
+
+    Returns:
+        The result of the first successful attempt
+
+    Raises:
+        CircuitOpenError: If the circuit is open
+        Exception: The last error once retries are exhausted or not allowed
+    """
+    max_attempts = max(1, settings.retry_max_attempts)
+    attempt = 0
+    while True:
+        attempt += 1
+        breaker.before_call()
+        try:
+            result = await func()
+        except asyncio.CancelledError:
+            breaker.record_neutral()
+            raise
+        except Exception as e:
+            if is_failure(e):
+                breaker.record_failure()
+            else:
+                breaker.record_neutral()
+
+            if attempt >= max_attempts or not is_retryable(e) or breaker.state == CircuitBreaker.OPEN:
+                raise
+
+            delay = backoff_delay(attempt, settings.retry_base_delay, settings.retry_max_delay)
+            retry_after = get_retry_after(e)
+            if retry_after is not None:
+                if retry_after > settings.retry_max_delay:
+                    # Not worth holding the request that long, fail now
+                    raise
+                delay = max(delay, retry_after)
+
+            logger.warning(
+                f"{breaker.name} call failed ({e!r}), retrying in {delay:.2f}s "
+                f"(attempt {attempt}/{max_attempts})"
+            )
+            await asyncio.sleep(delay)
+            continue
+
+        breaker.record_success()
+        return result
+
+
+def parse_retry_after(value: str | None) -> float | None:
+    """Parse a Retry-After header given in seconds."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        return None
@@ -0,0 +1,58 @@
+"""Coalesce concurrent identical calls into one upstream call."""
+
+import asyncio
+import logging
+from collections.abc import Awaitable, Callable, Hashable
+from typing import TypeVar
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class SingleFlight:
+    """
+    Run at most one call per key at a time; concurrent callers with the same
+    key wait for and share the result (or exception) of the call in flight.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.calls = 0
+        self.shared = 0
+        self._in_flight: dict[Hashable, asyncio.Task] = {}
+
+    async def do(self, key: Hashable, func: Callable[[], Awaitable[T]]) -> T:
+        """
+        Call func() unless an identical call is already in flight.
+
+        The call runs as its own task, so a caller being cancelled does not
+        cancel it for the other callers sharing it.
+
+        Args:
+            key: Identity of the call
+            func: Zero-argument coroutine function making the call
+
+        Returns:
+            The result of the (possibly shared) call
+        """
+        task = self._in_flight.get(key)
+        if task is None:
+            self.calls += 1
+            task = asyncio.ensure_future(func())
+            self._in_flight[key] = task
+            task.add_done_callback(lambda t: self._done(key, t))
+        else:
+            self.shared += 1
+            logger.debug(f"{self.name}: joined in-flight call")
+        return await asyncio.shield(task)
+
+    def _done(self, key: Hashable, task: asyncio.Task):
+        if self._in_flight.get(key) is task:
+            del self._in_flight[key]
+        if not task.cancelled():
+            # Mark the exception as retrieved even if every caller was cancelled
+            task.exception()
+
+    def __len__(self) -> int:
+        return len(self._in_flight)
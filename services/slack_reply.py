@@ -0,0 +1,98 @@
+"""Slack replies that are posted early and edited in place as results arrive."""
+
+import asyncio
+import logging
+import time
+
+from config import settings
+from services.rate_limiter import TokenBucket
+
+logger = logging.getLogger(__name__)
+
+# chat.update budget shared by every progressive reply in this process.
+# Final edits go out right away; intermediate ones wait for a token.
+_update_budget = TokenBucket(
+    rate=settings.progressive_reply_updates_per_minute / 60.0,
+    capacity=max(1.0, settings.progressive_reply_updates_per_minute / 6.0),
+)
+
+
+class ProgressiveReply:
+    """
+    A posted Slack message that is updated with chat.update.
+
+    Intermediate updates are coalesced: only the latest text is sent, at
+    most once per `min_interval` seconds per message and within the
+    process-wide chat.update budget. The final edit is sent immediately.
+    """
+
+    def __init__(self, client, channel: str, ts: str, text: str, min_interval: float):
+        self.client = client
+        self.channel = channel
+        self.ts = ts
+        self.min_interval = min_interval
+        self.edits = 0
+        self._sent_text = text
+        self._pending_text: str | None = None
+        self._last_edit = time.monotonic()
+        self._flush_task: asyncio.Task | None = None
+
+    @classmethod
+    async def post(cls, say, client, text: str, min_interval: float) -> "ProgressiveReply":
+        """Post the placeholder message with `say` and return a handle for editing it."""
+        response = await say(text)
+        return cls(client, response["channel"], response["ts"], text, min_interval)
+
+    def update(self, text: str):
+        """Schedule an edit to `text`, replacing any edit that has not been sent yet."""
+        self._pending_text = text
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.create_task(self._flush())
+
+    def _edit_delay(self) -> float:
+        return max(0.0, self._last_edit + self.min_interval - time.monotonic())
+
+    async def _flush(self):
+        delay = max(self._edit_delay(), _update_budget.wait_time(1))
+        if delay > 0:
+            await asyncio.sleep(delay)
+        text, self._pending_text = self._pending_text, None
+        if text is not None and text != self._sent_text:
+            _update_budget.consume(1)
+            await self._edit(text)
+
+    async def _edit(self, text: str) -> bool:
+        try:
+            await self.client.chat_update(channel=self.channel, ts=self.ts, text=text)
+        except Exception as e:
+            logger.warning(f"Failed to update message {self.ts}: {e}")
+            return False
+        finally:
+            self._last_edit = time.monotonic()
+        self._sent_text = text
+        self.edits += 1
+        return True
+
+    async def finish(self, text: str, say=None):
+        """
+        Replace the message with its final text.
+
+        Args:
+            text: Final message text
+            say: If given, used to post the text as a new message when the edit fails
+        """
+        if self._flush_task is not None and not self._flush_task.done():
+            # The final text supersedes whatever was waiting to be sent
+            self._flush_task.cancel()
+            try:
+                await self._flush_task
+            except asyncio.CancelledError:
+                pass
+        self._pending_text = None
+
+        if text == self._sent_text:
+            return
+        # Not delayed by min_interval or the budget: the user is waiting for it
+        _update_budget.consume(1)
+        if not await self._edit(text) and say is not None:
+            await say(text)
@@ -0,0 +1,301 @@
+"""Storage backends for user records."""
+
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
+from collections.abc import Callable
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+
+class StorageBackend(ABC):
+    """
+    Interface for user record storage.
+
+    Records are dicts with "api_key_encrypted", "api_key_prefix" and
+    "created_at". Implementations must not block the event loop.
+    """
+
+    # Shared backends are written by several bot processes. UserStore reads
+    # them through instead of preloading, and listens for invalidations.
+    shared = False
+
+    @abstractmethod
+    async def load_all(self) -> dict[str, dict]:
+        """Load every user record."""
+
+    @abstractmethod
+    async def get(self, user_id: str) -> dict | None:
+        """Load one user record."""
+
+    @abstractmethod
+    async def put(self, user_id: str, record: dict) -> None:
+        """Insert or replace one user record."""
+
+    @abstractmethod
+    async def delete(self, user_id: str) -> bool:
+        """Delete one user record. Returns True if it existed."""
+
+    async def subscribe(self, callback: Callable[[str | None], None]) -> None:
+        """
+        Call `callback(user_id)` whenever another process changes a record.
+
+        `callback(None)` means changes may have been missed and every locally
+        cached record should be dropped. Only meaningful for shared backends.
+        """
+
+    async def claim(self, key: str, ttl: float) -> bool:
+        """
+        Atomically claim a key for `ttl` seconds across every process sharing the backend.
+
+        Returns False if the key is already claimed. Non-shared backends have no
+        other processes to coordinate with and always return True.
+        """
+        return True
+
+    async def close(self) -> None:
+        """Release any resources held by the backend."""
+
+
+class JsonFileBackend(StorageBackend):
+    """Whole-file JSON storage (the original format), written atomically."""
+
+    def __init__(self, path: Path):
+        self.path = path
+        self._users: dict[str, dict] = {}
+        self._lock = asyncio.Lock()
+
+    def _read(self) -> dict[str, dict]:
+        if not self.path.exists():
+            return {}
+        with open(self.path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def _write(self, users: dict[str, dict]):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix(self.path.suffix + ".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(users, f, indent=2, ensure_ascii=False)
+            f.flush()
+            os.fsync(f.fileno())
+        tmp_path.replace(self.path)
+
+    async def load_all(self) -> dict[str, dict]:
+        self._users = await asyncio.to_thread(self._read)
+        return dict(self._users)
+
+    async def get(self, user_id: str) -> dict | None:
+        return self._users.get(user_id)
+
+    async def put(self, user_id: str, record: dict) -> None:
+        async with self._lock:
+            self._users[user_id] = record
+            await asyncio.to_thread(self._write, dict(self._users))
+
+    async def delete(self, user_id: str) -> bool:
+        async with self._lock:
+            if self._users.pop(user_id, None) is None:
+                return False
+            await asyncio.to_thread(self._write, dict(self._users))
+            return True
+
+
+class SqliteBackend(StorageBackend):
+    """SQLite storage in WAL mode, one row per user."""
+
+    def __init__(self, path: Path, legacy_json_path: Path | None = None):
+        self.path = path
+        self.legacy_json_path = legacy_json_path
+        self._conn: sqlite3.Connection | None = None
+        # sqlite3 connections are shared with worker threads, serialize access
+        self._lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS users ("
+                "user_id TEXT PRIMARY KEY, "
+                "api_key_encrypted TEXT NOT NULL, "
+                "api_key_prefix TEXT, "
+                "created_at TEXT"
+                ") WITHOUT ROWID"
+            )
+            self._conn = conn
+        return self._conn
+
+    def _migrate_from_json(self, conn: sqlite3.Connection):
+        """One-shot import of the legacy users.json file."""
+        if not self.legacy_json_path or not self.legacy_json_path.exists():
+            return
+
+        with open(self.legacy_json_path, "r", encoding="utf-8") as f:
+            users = json.load(f)
+
+        with conn:
+            conn.execute("BEGIN")
+            conn.executemany(
+                "INSERT OR IGNORE INTO users (user_id, api_key_encrypted, api_key_prefix, created_at) "
+                "VALUES (?, ?, ?, ?)",
+                [
+                    (user_id, r["api_key_encrypted"], r.get("api_key_prefix"), r.get("created_at"))
+                    for user_id, r in users.items()
+                ],
+            )
+
+        migrated_path = self.legacy_json_path.with_suffix(self.legacy_json_path.suffix + ".migrated")
+        self.legacy_json_path.replace(migrated_path)
+        logger.info(f"Migrated {len(users)} user records from {self.legacy_json_path} to {self.path}")
+
+    def _load_all(self) -> dict[str, dict]:
+        with self._lock:
+            conn = self._connect()
+            self._migrate_from_json(conn)
+            rows = conn.execute(
+                "SELECT user_id, api_key_encrypted, api_key_prefix, created_at FROM users"
+            ).fetchall()
+        return {
+            user_id: {
+                "api_key_encrypted": encrypted,
+                "api_key_prefix": prefix,
+                "created_at": created_at,
+            }
+            for user_id, encrypted, prefix, created_at in rows
+        }
+
+    def _get(self, user_id: str) -> dict | None:
+        with self._lock:
+            row = self._connect().execute(
+                "SELECT api_key_encrypted, api_key_prefix, created_at FROM users WHERE user_id = ?",
+                (user_id,),
+            ).fetchone()
+        if row is None:
+            return None
+        return {"api_key_encrypted": row[0], "api_key_prefix": row[1], "created_at": row[2]}
+
+    def _put(self, user_id: str, record: dict):
+        with self._lock:
+            self._connect().execute(
+                "INSERT OR REPLACE INTO users (user_id, api_key_encrypted, api_key_prefix, created_at) "
+                "VALUES (?, ?, ?, ?)",
+                (user_id, record["api_key_encrypted"], record.get("api_key_prefix"), record.get("created_at")),
+            )
+
+    def _delete(self, user_id: str) -> bool:
+        with self._lock:
+            cursor = self._connect().execute("DELETE FROM users WHERE user_id = ?", (user_id,))
+            return cursor.rowcount > 0
+
+    def _close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    async def load_all(self) -> dict[str, dict]:
+        return await asyncio.to_thread(self._load_all)
+
+    async def get(self, user_id: str) -> dict | None:
+        return await asyncio.to_thread(self._get, user_id)
+
+    async def put(self, user_id: str, record: dict) -> None:
+        await asyncio.to_thread(self._put, user_id, record)
+
+    async def delete(self, user_id: str) -> bool:
+        return await asyncio.to_thread(self._delete, user_id)
+
+    async def close(self) -> None:
+        await asyncio.to_thread(self._close)
+
+
+class RedisBackend(StorageBackend):
+    """
+    Shared storage on a Redis-protocol server, for running several bot processes.
+
+    Records live in one hash; every write is announced on a pub/sub channel so
+    other processes can drop their locally cached copy. Requires the "redis"
+    package.
+    """
+
+    shared = True
+
+    def __init__(self, url: str, key_prefix: str = "qurlbot:"):
+        try:
+            import redis.asyncio as redis
+        except ImportError as e:
+            raise RuntimeError("USER_STORE_BACKEND=redis requires the 'redis' package") from e
+
+        self._redis = redis.from_url(url, decode_responses=True)
+        self.key_prefix = key_prefix
+        self.hash_key = f"{key_prefix}users"
+        self.channel = f"{key_prefix}users:invalidate"
+        self._listener: asyncio.Task | None = None
+
+    async def load_all(self) -> dict[str, dict]:
+        users = await self._redis.hgetall(self.hash_key)
+        return {user_id: json.loads(raw) for user_id, raw in users.items()}
+
+    async def get(self, user_id: str) -> dict | None:
+        raw = await self._redis.hget(self.hash_key, user_id)
+        return json.loads(raw) if raw else None
+
+    async def put(self, user_id: str, record: dict) -> None:
+        async with self._redis.pipeline(transaction=True) as pipe:
+            pipe.hset(self.hash_key, user_id, json.dumps(record))
+            pipe.publish(self.channel, user_id)
+            await pipe.execute()
+
+    async def delete(self, user_id: str) -> bool:
+        async with self._redis.pipeline(transaction=True) as pipe:
+            pipe.hdel(self.hash_key, user_id)
+            pipe.publish(self.channel, user_id)
+            deleted, _ = await pipe.execute()
+        return deleted > 0
+
+    async def claim(self, key: str, ttl: float) -> bool:
+        return bool(await self._redis.set(f"{self.key_prefix}{key}", "1", nx=True, px=max(1, int(ttl * 1000))))
+
+    async def subscribe(self, callback: Callable[[str | None], None]) -> None:
+        if self._listener is None:
+            ready = asyncio.Event()
+            self._listener = asyncio.create_task(self._listen(callback, ready))
+            await ready.wait()
+
+    async def _listen(self, callback: Callable[[str | None], None], ready: asyncio.Event):
+        """Relay invalidation messages, resubscribing after connection errors."""
+        while True:
+            pubsub = self._redis.pubsub()
+            try:
+                await pubsub.subscribe(self.channel)
+                # Anything cached before (re)subscribing may be stale
+                callback(None)
+                ready.set()
+                async for message in pubsub.listen():
+                    if message["type"] == "message":
+                        callback(message["data"])
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"User store invalidation listener failed: {e}")
+                ready.set()
+                await asyncio.sleep(1.0)
+            finally:
+                await pubsub.aclose()
+
+    async def close(self) -> None:
+        if self._listener is not None:
+            self._listener.cancel()
+            try:
+                await self._listener
+            except asyncio.CancelledError:
+                pass
+            self._listener = None
+        await self._redis.aclose()
@@ -0,0 +1,224 @@
+"""Request tracing: spans carried through contextvars, exported as OTLP/JSON."""
+
+import asyncio
+import json
+import logging
+import os
+import random
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from pathlib import Path
+
+import httpx
+
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+SERVICE_NAME = "slack-qurl-bot"
+
+# OTLP span kinds and status codes
+SPAN_KIND_INTERNAL = 1
+SPAN_KIND_SERVER = 2
+SPAN_KIND_CLIENT = 3
+STATUS_OK = 1
+STATUS_ERROR = 2
+
+
+@dataclass
+class Span:
+    name: str
+    trace_id: str
+    span_id: str
+    parent_span_id: str | None
+    kind: int = SPAN_KIND_INTERNAL
+    start_ns: int = field(default_factory=time.time_ns)
+    end_ns: int = 0
+    attributes: dict = field(default_factory=dict)
+    status_code: int = 0
+    status_message: str = ""
+
+    def set_attribute(self, key: str, value):
+        self.attributes[key] = value
+
+    def to_otlp(self) -> dict:
+        span = {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "name": self.name,
+            "kind": self.kind,
+            "startTimeUnixNano": str(self.start_ns),
+            "endTimeUnixNano": str(self.end_ns),
+            "attributes": [_otlp_attribute(k, v) for k, v in self.attributes.items()],
+            "status": {"code": self.status_code, "message": self.status_message},
+        }
+        if self.parent_span_id:
+            span["parentSpanId"] = self.parent_span_id
+        return span
+
+
+def _otlp_attribute(key: str, value) -> dict:
+    if isinstance(value, bool):
+        return {"key": key, "value": {"boolValue": value}}
+    if isinstance(value, int):
+        return {"key": key, "value": {"intValue": str(value)}}
+    if isinstance(value, float):
+        return {"key": key, "value": {"doubleValue": value}}
+    return {"key": key, "value": {"stringValue": str(value)}}
+
+
+_current_span: ContextVar[Span | None] = ContextVar("current_span", default=None)
+
+
+class Tracer:
+    """
+    Create spans and export finished ones in batches.
+
+    Spans are only recorded inside a trace started with `trace()`; `span()`
+    outside of one is a no-op, so instrumented code costs next to nothing
+    for untraced or unsampled requests.
+    """
+
+    def __init__(
+        self,
+        exporter: str,
+        file_path: str,
+        endpoint: str,
+        sample_rate: float,
+        max_queue: int,
+    ):
+        self.exporter = exporter
+        self.file_path = Path(file_path)
+        self.endpoint = endpoint
+        self.sample_rate = sample_rate
+        self._queue: deque[Span] = deque(maxlen=max_queue)
+        self._client: httpx.AsyncClient | None = None
+        self.exported = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.exporter in ("file", "otlp") and self.sample_rate > 0
+
+    @contextmanager
+    def trace(self, name: str, correlation_id: str | None = None, start_ns: int | None = None, **attributes):
+        """
+        Start a new trace with a root span for one Slack event or command.
+
+        Args:
+            name: Root span name
+            correlation_id: Slack event/trigger ID, recorded on the root span
+            start_ns: Start time if the work began earlier (e.g. when it was queued)
+            **attributes: Extra span attributes
+        """
+        if not self.enabled or random.random() >= self.sample_rate:
+            yield None
+            return
+        span = Span(
+            name=name,
+            trace_id=os.urandom(16).hex(),
+            span_id=os.urandom(8).hex(),
+            parent_span_id=None,
+            kind=SPAN_KIND_SERVER,
+            start_ns=start_ns or time.time_ns(),
+            attributes=attributes,
+        )
+        if correlation_id:
+            span.set_attribute("correlation_id", correlation_id)
+        with self._activate(span):
+            yield span
+
+    @contextmanager
+    def span(self, name: str, kind: int = SPAN_KIND_INTERNAL, **attributes):
+        """Record a child span of the current span (no-op outside a trace)."""
+        parent = _current_span.get()
+        if parent is None:
+            yield None
+            return
+        span = Span(
+            name=name,
+            trace_id=parent.trace_id,
+            span_id=os.urandom(8).hex(),
+            parent_span_id=parent.span_id,
+            kind=kind,
+            attributes=attributes,
+        )
+        with self._activate(span):
+            yield span
+
+    @contextmanager
+    def _activate(self, span: Span):
+        token = _current_span.set(span)
+        try:
+            yield span
+            if not span.status_code:
+                span.status_code = STATUS_OK
+        except BaseException as e:
+            span.status_code = STATUS_ERROR
+            span.status_message = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            _current_span.reset(token)
+            span.end_ns = time.time_ns()
+            self._queue.append(span)
+
+    def _payload(self, spans: list[Span]) -> dict:
+        """Build an OTLP ExportTraceServiceRequest in its JSON encoding."""
+        return {
+            "resourceSpans": [{
+                "resource": {"attributes": [_otlp_attribute("service.name", SERVICE_NAME)]},
+                "scopeSpans": [{
+                    "scope": {"name": __name__},
+                    "spans": [span.to_otlp() for span in spans],
+                }],
+            }]
+        }
+
+    def _write_file(self, payload: dict):
+        self.file_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.file_path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(payload, ensure_ascii=False) + "\n")
+
+    async def flush(self):
+        """Export every queued span."""
+        if not self._queue:
+            return
+        spans = list(self._queue)
+        self._queue.clear()
+        payload = self._payload(spans)
+        try:
+            if self.exporter == "file":
+                await asyncio.to_thread(self._write_file, payload)
+            else:
+                if self._client is None:
+                    self._client = httpx.AsyncClient(timeout=5.0)
+                response = await self._client.post(self.endpoint, json=payload)
+                response.raise_for_status()
+            self.exported += len(spans)
+        except Exception as e:
+            logger.warning(f"Failed to export {len(spans)} spans: {e}")
+
+    async def run(self, interval: float):
+        """Export queued spans every `interval` seconds."""
+        while True:
+            await asyncio.sleep(interval)
+            await self.flush()
+
+    async def close(self):
+        """Export what is left and close the collector connection."""
+        await self.flush()
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+# Singleton instance
+tracer = Tracer(
+    exporter=settings.tracing_exporter,
+    file_path=settings.tracing_file,
+    endpoint=settings.tracing_otlp_endpoint,
+    sample_rate=settings.tracing_sample_rate,
+    max_queue=settings.tracing_max_queue,
+)
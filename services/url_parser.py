@@ -1,40 +1,223 @@
+import ipaddress
+import logging
 import re
+from functools import lru_cache
+from pathlib import Path
 from urllib.parse import urlparse
 
+logger = logging.getLogger(__name__)
+
+# Bundled Public Suffix List snapshot
+PUBLIC_SUFFIX_FILE = Path(__file__).parent.parent / "public_suffix_list.dat"
+
+# One tokenizer for everything URL-like in a Slack message, tried in this order:
+# Slack links <http://example.com|display_text> / <http://example.com>,
+# URLs with a protocol, and bare domains (like google.com) surrounded by whitespace.
+TOKEN_PATTERN = re.compile(
+    r'<(?P<slack>https?://[^|>]+)(?:\|[^>]+)?>'
+    r'|(?P<url>https?://[^\s<>"\']+)'
+    r'|(?<!\S)(?P<domain>(?:[a-zA-Z0-9][-a-zA-Z0-9]*\.)+[a-zA-Z]{2,}(?:/[^\s<>"\']*)?)(?!\S)'
+)
+
+
+def _covered(url: str) -> set[str]:
+    """The URL without scheme, its host and its host without www."""
+    bare = url.split("://", 1)[1]
+    host = bare.split("/", 1)[0]
+    return {bare, host, host.removeprefix("www.")}
+
+
+def _scan(text: str, clean_parts: list[str] | None = None) -> list[str]:
+    """
+    Extract deduplicated URLs from text in a single regex pass, in order of appearance.
+
+    A bare domain is dropped when any URL with a scheme in the message (before
+    or after it) has the same host, so "github.com ... https://github.com/x"
+    yields only the full URL.
+
+    If clean_parts is given, the text with Slack links unwrapped is
+    accumulated into it as a side effect.
+    """
+    # (url, is bare domain) in order of appearance
+    tokens: list[tuple[str, bool]] = []
+    # Everything the URLs with a scheme cover
+    covered: set[str] = set()
+    last_end = 0
+
+    for match in TOKEN_PATTERN.finditer(text):
+        kind = match.lastgroup
+        value = match.group(kind)
+
+        if clean_parts is not None:
+            clean_parts.append(text[last_end:match.start()])
+            clean_parts.append(value if kind == "slack" else match.group())
+            last_end = match.end()
+
+        if kind == "domain":
+            tokens.append((value, True))
+        else:
+            tokens.append((value, False))
+            covered.update(_covered(value))
+
+    if clean_parts is not None:
+        clean_parts.append(text[last_end:])
+
+    urls: list[str] = []
+    seen: set[str] = set()
+    for value, is_domain in tokens:
+        if is_domain:
+            if value in covered:
+                continue
+            url = f"https://{value}"
+            # Later bare domains with the same host are covered by this one
+            covered.update(_covered(url))
+        else:
+            url = value
+        if url not in seen:
+            seen.add(url)
+            urls.append(url)
+    return urls
+
 
 def extract_urls(text: str) -> list[str]:
     """Extract URLs from text message."""
-    urls = []
+    return _scan(text)
 
-    # First, extract Slack formatted links: <http://example.com|display_text> or <http://example.com>
-    slack_link_pattern = r'<(https?://[^|>]+)(?:\|[^>]+)?>'
-    for match in re.finditer(slack_link_pattern, text):
-        urls.append(match.group(1))
 
-    # Remove Slack links from text to avoid duplicate matching
-    clean_text = re.sub(slack_link_pattern, ' ', text)
+def split_slack_text(text: str) -> tuple[str, list[str]]:
+    """
+    Unwrap Slack links and extract URLs in the same pass.
 
-    # Pattern to match URLs (with or without protocol)
-    url_pattern = r'https?://[^\s<>"\']+'
-    domain_pattern = r'(?<!\S)([a-zA-Z0-9][-a-zA-Z0-9]*\.)+[a-zA-Z]{2,}(?:/[^\s<>"\']*)?(?!\S)'
+    Args:
+        text: Raw Slack message text
 
-    # Find full URLs with protocol
-    for match in re.finditer(url_pattern, clean_text):
-        url = match.group()
-        if url not in urls:
-            urls.append(url)
+    Returns:
+        Tuple of (text with <http://url|display> converted to plain URLs, URLs)
+    """
+    clean_parts: list[str] = []
+    urls = _scan(text, clean_parts)
+    return "".join(clean_parts), urls
 
-    # Find domain-only patterns (like google.com)
-    for match in re.finditer(domain_pattern, clean_text):
-        domain = match.group().strip()
-        if domain and not any(domain in url for url in urls):
-            urls.append(f"https://{domain}")
 
-    return urls
+def strip_urls(text: str) -> str:
+    """Replace URLs, Slack links and bare domains in text with spaces."""
+    return TOKEN_PATTERN.sub(" ", text)
 
 
-def normalize_url(url: str) -> str:
-    """Normalize URL to ensure it has https:// prefix, www subdomain, and lowercase domain."""
+class PublicSuffixIndex:
+    """
+    Trie of Public Suffix List rules, keyed by labels from the TLD inwards.
+
+    Only ICANN rules are used: private rules (github.io, ...) would make every
+    hosted site look like a registrable domain.
+    """
+
+    _RULE = "$"  # Marks a node that terminates a normal rule
+    _EXCEPTION = "!"  # Marks a node that terminates an exception rule
+
+    def __init__(self, rules: list[str]):
+        self._root: dict = {}
+        for rule in rules:
+            self._add(rule)
+
+    @classmethod
+    def load(cls, path: Path) -> "PublicSuffixIndex":
+        """Load rules from a file in the publicsuffix.org format."""
+        rules = []
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    line = line.strip()
+                    if line.startswith("// ===BEGIN PRIVATE DOMAINS==="):
+                        break
+                    if line and not line.startswith("//"):
+                        rules.append(line.split()[0].lower())
+        except OSError as e:
+            logger.error(f"Failed to load public suffix list: {e}")
+        return cls(rules)
+
+    def _add(self, rule: str):
+        exception = rule.startswith("!")
+        labels = rule.lstrip("!").split(".")
+        node = self._root
+        for label in reversed(labels):
+            node = node.setdefault(label, {})
+        node[self._EXCEPTION if exception else self._RULE] = True
+
+    def suffix_length(self, labels: list[str]) -> int:
+        """Number of trailing labels forming the public suffix (at least 1)."""
+        matched = 1  # Implicit "*" rule: the TLD is always a public suffix
+        nodes = [self._root]
+        for depth, label in enumerate(reversed(labels), start=1):
+            next_nodes = []
+            for node in nodes:
+                for key in (label, "*"):
+                    child = node.get(key)
+                    if child is None:
+                        continue
+                    if key == label and child.get(self._EXCEPTION):
+                        # Exception rules make the suffix one label shorter than the rule
+                        return depth - 1
+                    if child.get(self._RULE):
+                        matched = max(matched, depth)
+                    next_nodes.append(child)
+            if not next_nodes:
+                break
+            nodes = next_nodes
+        return matched
+
+    def registrable_domain(self, host: str) -> str | None:
+        """Return the registrable domain (eTLD+1) of a host, or None for a bare suffix."""
+        labels = host.split(".")
+        suffix_length = self.suffix_length(labels)
+        if len(labels) <= suffix_length:
+            return None
+        return ".".join(labels[-(suffix_length + 1):])
+
+
+public_suffixes = PublicSuffixIndex.load(PUBLIC_SUFFIX_FILE)
+
+
+def _is_ip_address(host: str) -> bool:
+    try:
+        ipaddress.ip_address(host.strip("[]"))
+        return True
+    except ValueError:
+        return False
+
+
+@lru_cache(maxsize=4096)
+def _normalize_netloc(netloc: str) -> str:
+    """Lowercase the host and add www. when it is a bare registrable domain."""
+    netloc = netloc.lower()
+    userinfo, at, hostport = netloc.rpartition("@")
+    host, colon, port = hostport.partition(":") if not hostport.startswith("[") else (hostport, "", "")
+    host = host.rstrip(".")
+
+    # Add www. prefix if host is a registrable domain (e.g., google.com -> www.google.com,
+    # example.co.uk -> www.example.co.uk), but not for IPs, single-label hosts or hosts
+    # already starting with www. (www.gov.uk is itself registrable under gov.uk)
+    if (
+        "." in host
+        and not host.startswith("www.")
+        and not _is_ip_address(host)
+        and public_suffixes.registrable_domain(host) == host
+    ):
+        host = f"www.{host}"
+    return f"{userinfo}{at}{host}{colon}{port}"
+
+
+@lru_cache(maxsize=4096)
+def normalize_and_validate(url: str) -> str | None:
+    """
+    Normalize a URL and validate it with a single parse.
+
+    Args:
+        url: URL with or without scheme
+
+    Returns:
+        Normalized https:// URL, or None if it is not a valid URL
+    """
     url = url.strip()
     # Convert http:// to https://
     if url.startswith("http://"):
@@ -42,17 +225,22 @@ def normalize_url(url: str) -> str:
     elif not url.startswith("https://"):
         url = f"https://{url}"
 
-    # Normalize domain to lowercase (domain is case-insensitive)
-    parsed = urlparse(url)
-    if parsed.netloc:
-        domain = parsed.netloc.lower()
-        # Add www. prefix if domain has no subdomain (e.g., google.com -> www.google.com)
-        parts = domain.split('.')
-        if len(parts) == 2 and not domain.startswith('www.'):
-            domain = f"www.{domain}"
-        normalized = parsed._replace(netloc=domain)
-        url = normalized.geturl()
-    return url
+    try:
+        parsed = urlparse(url)
+    except ValueError:
+        return None
+    if not parsed.netloc:
+        return None
+    return parsed._replace(netloc=_normalize_netloc(parsed.netloc)).geturl()
+
+
+def normalize_url(url: str) -> str:
+    """Normalize URL to ensure it has https:// prefix, www subdomain, and lowercase domain."""
+    normalized = normalize_and_validate(url)
+    if normalized is None:
+        url = url.strip()
+        return url if url.startswith("https://") else f"https://{url.removeprefix('http://')}"
+    return normalized
 
 
 def is_valid_url(url: str) -> bool:
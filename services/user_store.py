@@ -1,29 +1,60 @@
 """User API Key storage service."""
 
-import json
 import logging
-import os
+import time
+from collections import OrderedDict
 from datetime import datetime
 from pathlib import Path
 from cryptography.fernet import Fernet
 from base64 import urlsafe_b64encode
 from hashlib import sha256
 
+from services.storage import JsonFileBackend, RedisBackend, SqliteBackend, StorageBackend
+from services.tracing import tracer
+
 logger = logging.getLogger(__name__)
 
 # Data file path
 DATA_DIR = Path(__file__).parent.parent / "data"
 USERS_FILE = DATA_DIR / "users.json"
+USERS_DB = DATA_DIR / "users.db"
+
+
+def create_backend(name: str) -> StorageBackend:
+    """Create the storage backend selected in settings."""
+    if name == "json":
+        return JsonFileBackend(USERS_FILE)
+    if name == "sqlite":
+        return SqliteBackend(USERS_DB, legacy_json_path=USERS_FILE)
+    if name == "redis":
+        from config import settings
+        return RedisBackend(settings.redis_url, key_prefix=settings.redis_key_prefix)
+    raise ValueError(f"Unknown user store backend: {name}")
 
 
 class UserStore:
     """Store and manage user API keys."""
 
-    def __init__(self):
+    def __init__(self, backend: StorageBackend | None = None):
+        from config import settings
         self._users: dict = {}
+        # With a shared backend _users is a bounded read-through cache
+        self._shared_cache_size = settings.shared_user_cache_size
+        # Bumped on every local or remote change, so a read that raced one is not cached
+        self._generation = 0
         self._fernet: Fernet | None = None
+        self._backend = backend or create_backend(settings.user_store_backend)
+        # Decrypted keys: user_id -> (expires_at, key bytes), wiped on eviction
+        self._key_cache: OrderedDict[str, tuple[float, bytearray]] = OrderedDict()
+        self._key_cache_ttl = settings.key_cache_ttl
+        self._key_cache_size = settings.key_cache_size
+        self.key_cache_hits = 0
+        self.key_cache_misses = 0
         self._init_encryption()
-        self._load()
+
+    @property
+    def backend(self) -> StorageBackend:
+        return self._backend
 
     def _init_encryption(self):
         """Initialize encryption key from config."""
@@ -32,30 +63,105 @@ class UserStore:
         key = urlsafe_b64encode(sha256(settings.encryption_secret.encode()).digest())
         self._fernet = Fernet(key)
 
-    def _load(self):
-        """Load users from file."""
-        if USERS_FILE.exists():
-            try:
-                with open(USERS_FILE, "r", encoding="utf-8") as f:
-                    self._users = json.load(f)
-                logger.info(f"Loaded {len(self._users)} user records")
-            except Exception as e:
-                logger.error(f"Failed to load users: {e}")
-                self._users = {}
-        else:
-            self._users = {}
-            # Ensure data directory exists
-            DATA_DIR.mkdir(parents=True, exist_ok=True)
-
-    def _save(self):
-        """Save users to file."""
+    async def start(self):
+        """Load users from the storage backend (or subscribe to changes if it is shared)."""
+        if self._backend.shared:
+            # Records are read through on demand; other processes announce changes
+            await self._backend.subscribe(self._on_invalidate)
+            logger.info("Using shared user store")
+            return
         try:
-            DATA_DIR.mkdir(parents=True, exist_ok=True)
-            with open(USERS_FILE, "w", encoding="utf-8") as f:
-                json.dump(self._users, f, indent=2, ensure_ascii=False)
-            logger.info(f"Successfully saved {len(self._users)} user records to {USERS_FILE}")
+            self._users = await self._backend.load_all()
+            logger.info(f"Loaded {len(self._users)} user records")
         except Exception as e:
-            logger.error(f"Failed to save users: {e}")
+            logger.error(f"Failed to load users: {e}")
+            self._users = {}
+
+    def _on_invalidate(self, user_id: str | None):
+        """Drop local copies of a record changed elsewhere (None drops everything)."""
+        self._generation += 1
+        if user_id is None:
+            self._users.clear()
+            self.clear_key_cache()
+        else:
+            self._users.pop(user_id, None)
+            self._cache_invalidate(user_id)
+
+    async def _get_record(self, user_id: str) -> dict | None:
+        """Get a user record, reading through to a shared backend on a local miss."""
+        if user_id in self._users:
+            if self._backend.shared:
+                # Re-insert to mark as recently used
+                self._users[user_id] = self._users.pop(user_id)
+            return self._users[user_id]
+        if not self._backend.shared:
+            return None
+        generation = self._generation
+        record = await self._backend.get(user_id)
+        if generation == self._generation:
+            # Misses are cached too (as None) until an invalidation arrives
+            self._remember(user_id, record)
+        return record
+
+    def _remember(self, user_id: str, record: dict | None):
+        """Keep a record locally, evicting the least recently used ones beyond the shared cache size."""
+        self._users.pop(user_id, None)
+        self._users[user_id] = record
+        if self._backend.shared:
+            while len(self._users) > self._shared_cache_size:
+                del self._users[next(iter(self._users))]
+
+    async def close(self):
+        """Wipe cached keys and close the storage backend."""
+        self.clear_key_cache()
+        await self._backend.close()
+
+    @staticmethod
+    def _wipe(buffer: bytearray):
+        """Overwrite key material in place."""
+        for i in range(len(buffer)):
+            buffer[i] = 0
+
+    def _cache_get(self, user_id: str) -> str | None:
+        entry = self._key_cache.get(user_id)
+        if entry is None:
+            return None
+        expires_at, buffer = entry
+        if expires_at <= time.monotonic():
+            self._cache_invalidate(user_id)
+            return None
+        self._key_cache.move_to_end(user_id)
+        return buffer.decode()
+
+    def _cache_put(self, user_id: str, api_key: str):
+        if self._key_cache_size <= 0 or self._key_cache_ttl <= 0:
+            return
+        self._cache_invalidate(user_id)
+        self._key_cache[user_id] = (time.monotonic() + self._key_cache_ttl, bytearray(api_key.encode()))
+        while len(self._key_cache) > self._key_cache_size:
+            _, (_, buffer) = self._key_cache.popitem(last=False)
+            self._wipe(buffer)
+
+    def _cache_invalidate(self, user_id: str):
+        entry = self._key_cache.pop(user_id, None)
+        if entry is not None:
+            self._wipe(entry[1])
+
+    def clear_key_cache(self):
+        """Drop and wipe all cached decrypted keys."""
+        for _, buffer in self._key_cache.values():
+            self._wipe(buffer)
+        self._key_cache.clear()
+
+    def key_cache_stats(self) -> dict:
+        """Return decrypted-key cache counters."""
+        total = self.key_cache_hits + self.key_cache_misses
+        return {
+            "size": len(self._key_cache),
+            "hits": self.key_cache_hits,
+            "misses": self.key_cache_misses,
+            "hit_rate": self.key_cache_hits / total if total else 0.0,
+        }
 
     def _encrypt(self, value: str) -> str:
         """Encrypt a value."""
@@ -65,7 +171,7 @@ class UserStore:
         """Decrypt a value."""
         return self._fernet.decrypt(value.encode()).decode()
 
-    def set_api_key(self, user_id: str, api_key: str) -> None:
+    async def set_api_key(self, user_id: str, api_key: str) -> None:
         """
         Save user's API key.
 
@@ -73,15 +179,18 @@ class UserStore:
             user_id: Slack user ID
             api_key: LayerV API key
         """
-        self._users[user_id] = {
+        record = {
             "api_key_encrypted": self._encrypt(api_key),
             "api_key_prefix": api_key[:8] + "..." if len(api_key) > 8 else api_key,
             "created_at": datetime.utcnow().isoformat() + "Z",
         }
-        self._save()
+        await self._backend.put(user_id, record)
+        self._generation += 1
+        self._remember(user_id, record)
+        self._cache_invalidate(user_id)
         logger.info(f"Saved API key for user {user_id}")
 
-    def get_api_key(self, user_id: str) -> str | None:
+    async def get_api_key(self, user_id: str) -> str | None:
         """
         Get user's API key.
 
@@ -91,24 +200,35 @@ class UserStore:
         Returns:
             Decrypted API key or None if not found
         """
-        logger.info(f"Getting API key for user {user_id}, total users: {len(self._users)}")
-        user = self._users.get(user_id)
-        if not user:
-            logger.warning(f"No API key found for user {user_id}")
-            return None
-        try:
-            api_key = self._decrypt(user["api_key_encrypted"])
-            logger.info(f"Successfully decrypted API key for user {user_id}: {api_key[:8]}...")
-            return api_key
-        except Exception as e:
-            logger.error(f"Failed to decrypt API key for {user_id}: {e}")
-            return None
+        with tracer.span("user_store.get_api_key", user_id=user_id) as span:
+            api_key = self._cache_get(user_id)
+            if span is not None:
+                span.set_attribute("cache_hit", api_key is not None)
+            if api_key is not None:
+                self.key_cache_hits += 1
+                return api_key
+            self.key_cache_misses += 1
 
-    def has_api_key(self, user_id: str) -> bool:
+            generation = self._generation
+            user = await self._get_record(user_id)
+            if not user:
+                logger.warning(f"No API key found for user {user_id}")
+                return None
+            try:
+                api_key = self._decrypt(user["api_key_encrypted"])
+                logger.debug(f"Decrypted API key for user {user_id}")
+                if generation == self._generation:
+                    self._cache_put(user_id, api_key)
+                return api_key
+            except Exception as e:
+                logger.error(f"Failed to decrypt API key for {user_id}: {e}")
+                return None
+
+    async def has_api_key(self, user_id: str) -> bool:
         """Check if user has an API key configured."""
-        return user_id in self._users
+        return await self._get_record(user_id) is not None
 
-    def get_key_info(self, user_id: str) -> dict | None:
+    async def get_key_info(self, user_id: str) -> dict | None:
         """
         Get user's API key info (without full key).
 
@@ -118,7 +238,7 @@ class UserStore:
         Returns:
             Dict with key prefix and created_at, or None
         """
-        user = self._users.get(user_id)
+        user = await self._get_record(user_id)
         if not user:
             return None
         return {
@@ -126,7 +246,7 @@ class UserStore:
             "created_at": user.get("created_at"),
         }
 
-    def delete_api_key(self, user_id: str) -> bool:
+    async def delete_api_key(self, user_id: str) -> bool:
         """
         Delete user's API key.
 
@@ -136,12 +256,14 @@ class UserStore:
         Returns:
             True if deleted, False if not found
         """
-        if user_id in self._users:
-            del self._users[user_id]
-            self._save()
-            logger.info(f"Deleted API key for user {user_id}")
-            return True
-        return False
+        if await self._get_record(user_id) is None:
+            return False
+        self._users.pop(user_id, None)
+        self._cache_invalidate(user_id)
+        await self._backend.delete(user_id)
+        self._generation += 1
+        logger.info(f"Deleted API key for user {user_id}")
+        return True
 
 
 # Singleton instance
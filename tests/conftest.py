@@ -0,0 +1,10 @@
+import os
+import sys
+from pathlib import Path
+
+# Settings are read at import time; give the required ones harmless values
+os.environ.setdefault("SLACK_BOT_TOKEN", "xoxb-test")
+os.environ.setdefault("SLACK_APP_TOKEN", "xapp-test")
+os.environ.setdefault("ANTHROPIC_API_KEY", "sk-ant-test")
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
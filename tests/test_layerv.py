@@ -0,0 +1,108 @@
+"""LayerVClient.create_qurls against the local LayerV stand-in."""
+
+import asyncio
+
+import pytest
+
+from config import settings
+from loadtest.stubs import LayerVStub, UpstreamBehavior
+from services.layerv import InvalidApiKeyError, LayerVClient, QURLRequest, QURLResponse
+
+API_KEY = "lv_live_test_key"
+TARGETS = [f"https://site{i}.example.com/page" for i in range(7)]
+
+
+def run(scenario, **stub_options):
+    """Run `scenario(client, stub)` with a fresh client talking to a fresh stub."""
+
+    async def main():
+        stub = LayerVStub(stub_options.pop("behavior", UpstreamBehavior()), **stub_options)
+        await stub.start()
+        client = LayerVClient()
+        client.api_url = stub.url
+        try:
+            return await scenario(client, stub)
+        finally:
+            await client.aclose()
+            await stub.close()
+
+    return asyncio.run(main())
+
+
+def target_of(result: QURLResponse) -> str:
+    return result.qurl_link.split("#", 1)[1]
+
+
+@pytest.mark.parametrize("batch", [True, False])
+def test_results_keep_request_order(batch, monkeypatch):
+    # Several chunks on the batch path; jitter reorders completions on the pipelined one
+    monkeypatch.setattr(settings, "layerv_batch_size", 3)
+
+    async def scenario(client, stub):
+        reported = {}
+        results = await client.create_qurls(
+            API_KEY,
+            [QURLRequest(target_url=url) for url in TARGETS],
+            on_result=lambda i, result: reported.setdefault(i, result),
+        )
+        return results, reported, stub
+
+    results, reported, stub = run(scenario, batch=batch, behavior=UpstreamBehavior(latency=0.02, jitter=0.02))
+
+    assert [target_of(r) for r in results] == TARGETS
+    assert reported == dict(enumerate(results))
+    if batch:
+        assert stub.calls["qurl_batch"] == 3 and stub.calls["qurl"] == 0
+    else:
+        assert stub.calls["qurl"] == len(TARGETS)
+
+
+@pytest.mark.parametrize("batch", [True, False])
+def test_item_errors_do_not_fail_the_call(batch):
+    failing = TARGETS[2]
+
+    async def scenario(client, stub):
+        return await client.create_qurls(API_KEY, [QURLRequest(target_url=url) for url in TARGETS])
+
+    results = run(scenario, batch=batch, fail_targets={failing})
+
+    for url, result in zip(TARGETS, results):
+        if url == failing:
+            assert isinstance(result, Exception)
+        else:
+            assert target_of(result) == url
+
+
+@pytest.mark.parametrize("batch", [True, False])
+def test_invalid_api_key_aborts_the_call(batch):
+    async def scenario(client, stub):
+        with pytest.raises(InvalidApiKeyError):
+            await client.create_qurls(API_KEY, [QURLRequest(target_url=url) for url in TARGETS])
+
+    run(scenario, batch=batch, behavior=UpstreamBehavior(error_rate=1.0, error_status=401))
+
+
+@pytest.mark.parametrize("batch", [True, False])
+def test_identical_requests_mint_distinct_links_without_coalescing(batch):
+    async def scenario(client, stub):
+        requests = [QURLRequest(target_url=TARGETS[0]) for _ in range(3)]
+        return await client.create_qurls(API_KEY, requests, coalesce=False)
+
+    results = run(scenario, batch=batch, behavior=UpstreamBehavior(latency=0.02))
+
+    assert len({r.resource_id for r in results}) == 3
+
+
+def test_concurrent_identical_calls_share_one_request():
+    async def scenario(client, stub):
+        requests = [QURLRequest(target_url=url) for url in TARGETS[:2]]
+        first, second = await asyncio.gather(
+            client.create_qurls(API_KEY, requests, owner="U1"),
+            client.create_qurls(API_KEY, requests, owner="U1"),
+        )
+        return first, second, stub
+
+    first, second, stub = run(scenario, behavior=UpstreamBehavior(latency=0.05))
+
+    assert first == second and first is not second
+    assert stub.calls["qurl_batch"] == 1
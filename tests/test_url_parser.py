@@ -0,0 +1,39 @@
+"""URL extraction and normalization."""
+
+import pytest
+
+from services.url_parser import extract_urls, normalize_url, split_slack_text
+
+
+@pytest.mark.parametrize("text", [
+    "qurl github.com and https://github.com/x",
+    "qurl https://github.com/x and github.com",
+    "qurl <https://github.com/x|github.com/x> and github.com",
+])
+def test_bare_domain_covered_by_a_full_url_anywhere(text):
+    assert extract_urls(text) == ["https://github.com/x"]
+
+
+def test_urls_are_deduplicated_in_order_of_appearance():
+    text = "b.com then https://a.com/p then b.com and https://a.com/p"
+    assert extract_urls(text) == ["https://b.com", "https://a.com/p"]
+
+
+def test_split_slack_text_unwraps_links():
+    assert split_slack_text("see <https://c.com/p|c.com> and d.com") == (
+        "see https://c.com/p and d.com",
+        ["https://c.com/p", "https://d.com"],
+    )
+
+
+@pytest.mark.parametrize("url, expected", [
+    ("example.com", "https://www.example.com"),
+    ("http://Example.co.uk/Path", "https://www.example.co.uk/Path"),
+    ("https://www.gov.uk/browse", "https://www.gov.uk/browse"),
+    ("www.nhs.uk", "https://www.nhs.uk"),
+    ("https://x.github.io/repo", "https://x.github.io/repo"),
+    ("https://192.168.1.10:8080/a", "https://192.168.1.10:8080/a"),
+    ("https://[::1]/a", "https://[::1]/a"),
+])
+def test_normalize_url(url, expected):
+    assert normalize_url(url) == expected
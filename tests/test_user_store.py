@@ -0,0 +1,104 @@
+"""Two UserStore instances sharing a local fake Redis."""
+
+import asyncio
+import threading
+
+import pytest
+
+from config import settings
+from services.user_store import UserStore
+
+fakeredis = pytest.importorskip("fakeredis")
+pytest.importorskip("redis")
+
+
+@pytest.fixture
+def redis_url():
+    server = fakeredis.TcpFakeServer(("127.0.0.1", 0))
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    host, port = server.server_address
+    yield f"redis://{host}:{port}/0"
+    server.shutdown()
+    server.server_close()
+
+
+def run_with_stores(redis_url, scenario):
+    """Run `scenario(a, b)` with two started stores on the same Redis."""
+    from services.storage import RedisBackend
+
+    async def main():
+        stores = [UserStore(backend=RedisBackend(redis_url, key_prefix="test:")) for _ in range(2)]
+        for store in stores:
+            await store.start()
+        try:
+            return await scenario(*stores)
+        finally:
+            for store in stores:
+                await store.close()
+
+    return asyncio.run(main())
+
+
+async def eventually(condition, timeout: float = 2.0):
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not await condition():
+        assert asyncio.get_running_loop().time() < deadline, "condition not met in time"
+        await asyncio.sleep(0.01)
+
+
+def test_changes_reach_the_other_instance(redis_url):
+    async def scenario(a, b):
+        await a.set_api_key("U1", "lv_live_first_key")
+        assert await b.get_api_key("U1") == "lv_live_first_key"
+
+        await a.set_api_key("U1", "lv_live_second_key")
+
+        async def updated():
+            return await b.get_api_key("U1") == "lv_live_second_key"
+
+        await eventually(updated)
+
+        await a.delete_api_key("U1")
+
+        async def deleted():
+            return not await b.has_api_key("U1")
+
+        await eventually(deleted)
+
+    run_with_stores(redis_url, scenario)
+
+
+def test_read_racing_an_invalidation_is_not_cached(redis_url):
+    async def scenario(a, b):
+        backend_get = b.backend.get
+
+        async def get_then_change(user_id):
+            # The read completes, then another instance sets the key and its
+            # invalidation arrives before the (now stale) result is returned
+            record = await backend_get(user_id)
+            generation = b._generation
+            await a.set_api_key(user_id, "lv_live_new_key")
+            while b._generation == generation:
+                await asyncio.sleep(0.01)
+            return record
+
+        b.backend.get = get_then_change
+        assert not await b.has_api_key("U2")
+        b.backend.get = backend_get
+
+        assert await b.has_api_key("U2")
+        assert await b.get_api_key("U2") == "lv_live_new_key"
+
+    run_with_stores(redis_url, scenario)
+
+
+def test_shared_record_cache_is_bounded(redis_url, monkeypatch):
+    monkeypatch.setattr(settings, "shared_user_cache_size", 3)
+
+    async def scenario(a, b):
+        for i in range(10):
+            await b.has_api_key(f"U{i}")
+        assert len(b._users) == 3
+
+    run_with_stores(redis_url, scenario)